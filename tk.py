@@ -3,23 +3,40 @@
 
 from __future__ import annotations
 import math
+import statistics
 
 import sys
 from enum import Enum
-from typing import List, Tuple, Any, Optional
+from typing import List, Tuple, Any, Optional, Dict
 import os
 import re
 import shutil
 import argparse
 import subprocess
 import tempfile
+import concurrent.futures
+import signal
+import threading
+import time
 import io
 import unicodedata
 import urllib.request
 import urllib.error
 import json
+import hashlib
+import copy
+import pstats
+import filecmp
+import mmap
+import socket
+import atexit
+import queue
 from subprocess import PIPE
 import configparser
+try:
+    import resource  # only on unix, without it the limits of cpu and memory are not applied
+except ImportError:
+    resource = None
 
 asc2only: bool = False
 
@@ -100,6 +117,9 @@ class Symbol:
     wrong = ""
     compilation = ""
     execution = ""
+    timeout = ""
+    memory = ""
+    budget = ""
     unequal = ""
     equalbar= ""
     hbar = "─"
@@ -120,6 +140,9 @@ class Symbol:
         Symbol.wrong = "W" if asc2only else "ω"
         Symbol.compilation = "C" if asc2only else "ϲ"
         Symbol.execution = "E" if asc2only else "ϵ"
+        Symbol.timeout = "T" if asc2only else "τ"
+        Symbol.memory = "M" if asc2only else "μ"
+        Symbol.budget = "B" if asc2only else "β"
         Symbol.unequal = "#" if asc2only else "≠"
         Symbol.equalbar = "|" if asc2only else "│"
 
@@ -133,6 +156,9 @@ class Symbol:
         # Symbol.wrong       = Colored.paint(Symbol.wrong,       Color.RED)
         Symbol.compilation = Colored.paint(Symbol.compilation, Color.YELLOW)
         Symbol.execution   = Colored.paint(Symbol.execution,   Color.YELLOW)
+        Symbol.timeout     = Colored.paint(Symbol.timeout,     Color.MAGENTA)
+        Symbol.memory      = Colored.paint(Symbol.memory,      Color.MAGENTA)
+        Symbol.budget      = Colored.paint(Symbol.budget,      Color.MAGENTA)
         Symbol.unequal     = Colored.paint(Symbol.unequal,     Color.RED)
         Symbol.equalbar    = Colored.paint(Symbol.equalbar,    Color.GREEN)
 
@@ -144,6 +170,9 @@ class ExecutionResult(Enum):
     WRONG_OUTPUT = Symbol.failure
     COMPILATION_ERROR = Symbol.compilation
     EXECUTION_ERROR = Symbol.execution
+    TIME_LIMIT_EXCEEDED = Symbol.timeout
+    MEMORY_LIMIT_EXCEEDED = Symbol.memory
+    BUDGET_EXCEEDED = Symbol.budget  # right answer, but slower or bigger than the budget of the case
 
     def __str__(self):
         return self.value
@@ -154,13 +183,24 @@ class Unit:
         self.source_pad = 0  # stores the pad to justify the source file
         self.case = case  # name
         self.case_pad = 0  # stores the pad to justify the case name
+        self.input_file: Optional[str] = None  # large cases keep the input in the file, loaded only when needed
+        self.output_file: Optional[str] = None  # same for the expected output
+        self.preview: Optional[str] = None  # expected output around the first mismatch of a large case
+        self.compare: Optional[str] = None  # comparator spec, None for the exact comparison
+        self.mismatch: Optional[Mismatch] = None  # first mismatch found by the comparator
         self.input = inp  # input
         self.output = outp  # expected output
-        self.user: Optional[str] = None  # solver generated answer
+        self.user: Optional[str] = None  # solver generated answer, None if not tested or equal to the expected
         self.grade: Optional[int] = grade  # None represents proportional gr, 100 represents all
         self.grade_reduction: int = 0 #if grade is None, this atribute should be filled with the right grade reduction
+        self.time_budget: Optional[float] = None  # seconds of cpu, or wall if cpu is not measured
+        self.memory_budget: Optional[int] = None  # MB of peak rss
         self.index = 0
         self.repeated: Optional[int] = None
+        self.peak_rss: Optional[int] = None  # peak resident memory of the solver in KB
+        self.wall_time: Optional[float] = None  # seconds
+        self.user_time: Optional[float] = None  # cpu seconds in user mode, None if not measured
+        self.sys_time: Optional[float] = None  # cpu seconds in kernel mode
 
         self.result: ExecutionResult = ExecutionResult.UNTESTED
 
@@ -170,9 +210,222 @@ class Unit:
         rep = "" if self.repeated is None else "[" + str(self.repeated) + "]"
         return "(%s)[%s] GR:%s %s (%s) %s" % (self.result, index, grade, self.source.ljust(self.source_pad), self.case.ljust(self.case_pad), rep)
 
+    @staticmethod
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else "{:.1f}ms".format(value * 1000)
+
+    @staticmethod
+    def mb(value: Optional[int]) -> str:
+        return "-" if value is None else "{:.1f}MB".format(value / 1024)
+
+    # columns with the resources used by the last execution
+    def resources(self) -> str:
+        return "wall:%s user:%s sys:%s rss:%s" % (Unit.ms(self.wall_time).rjust(9), Unit.ms(self.user_time).rjust(9),
+                                                  Unit.ms(self.sys_time).rjust(9), Unit.mb(self.peak_rss).rjust(8))
+
+    @staticmethod
+    def __load(path: str) -> str:
+        with open(path) as f:
+            value = f.read()
+        return value + ("" if value.endswith("\n") else "\n")
+
+    @property
+    def input(self) -> str:
+        return self.__input if self.input_file is None else Unit.__load(self.input_file)
+
+    @input.setter
+    def input(self, value: str):
+        self.input_file = None
+        self.__input = value
+
+    @property
+    def output(self) -> str:
+        return self.__output if self.output_file is None else Unit.__load(self.output_file)
+
+    @output.setter
+    def output(self, value: str):
+        self.output_file = None
+        self.__output = value
+
+    # the start of the input, without loading all the file
+    def input_head(self, size: int) -> str:
+        if self.input_file is None:
+            return self.__input[:size]
+        with open(self.input_file) as f:
+            return f.read(size)
+
+    def input_size(self) -> int:
+        return os.path.getsize(self.input_file) if self.input_file is not None else len(self.__input)
+
+    def same_input(self, other) -> bool:
+        if self.input_file is not None and other.input_file is not None:
+            return filecmp.cmp(self.input_file, other.input_file, shallow=False)
+        if self.input_file is not None or other.input_file is not None:
+            return self.input_size() == other.input_size() and self.input == other.input
+        return self.input == other.input
+
+class BuildCache:
+    enabled: bool = True
+    max_size: int = 512  # MB
+    folder: str = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "tk", "build")
+    failure_file = ".failure"
+    __versions: Dict[str, str] = {}
+    __evict_scheduled = False  # the cache is sized once, when tk ends, not after each store
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def toolchain_version(compiler: str) -> str:
+        if compiler not in BuildCache.__versions:
+            flag = "-version" if compiler == "javac" else "--version"
+            _code, stdout, stderr = Runner.subprocess_run([compiler, flag])
+            BuildCache.__versions[compiler] = stdout + stderr
+        return BuildCache.__versions[compiler]
+
+    # the key changes if the sources, the flags or the compiler version change
+    @staticmethod
+    def key(args: List[str], path_list: List[str]) -> str:
+        digest = hashlib.sha256()
+        digest.update(BuildCache.toolchain_version(args[0]).encode())
+        digest.update("\0".join(args).encode())
+        for path in path_list:
+            digest.update(b"\0" + os.path.basename(path).encode() + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    # return the folder with the artifacts of a previous build
+    @staticmethod
+    def lookup(key: str) -> Optional[str]:
+        if not BuildCache.enabled:
+            return None
+        entry = os.path.join(BuildCache.folder, key)
+        if not os.path.isdir(entry):
+            return None
+        os.utime(entry)  # mark as recently used
+        return entry
+
+    # folder to build the artifacts, created inside the cache to be moved with a rename
+    @staticmethod
+    def workspace(fallback: str) -> str:
+        if BuildCache.enabled:
+            try:
+                os.makedirs(BuildCache.folder, exist_ok=True)
+                return tempfile.mkdtemp(dir=BuildCache.folder, prefix=".tmp")
+            except OSError:
+                pass
+        return tempfile.mkdtemp(dir=fallback)
+
+    @staticmethod
+    def get_failure(entry: str) -> Optional[str]:
+        path = os.path.join(entry, BuildCache.failure_file)
+        if not os.path.isfile(path):
+            return None
+        with open(path) as f:
+            return f.read()
+
+    # move the artifacts folder to the cache and return the new location
+    @staticmethod
+    def store(key: str, artifacts: str, replace: bool = False) -> str:
+        if not BuildCache.enabled:
+            return artifacts
+        entry = os.path.join(BuildCache.folder, key)
+        if replace and os.path.isdir(entry):
+            trash = BuildCache.workspace(tempfile.gettempdir())
+            try:
+                os.rename(entry, os.path.join(trash, key))
+            except OSError:
+                pass
+            shutil.rmtree(trash, ignore_errors=True)
+        try:
+            os.rename(artifacts, entry)
+        except OSError:  # stored by another execution or cache not writable
+            if not os.path.isdir(entry):
+                return artifacts
+            shutil.rmtree(artifacts, ignore_errors=True)
+            return entry
+        if not BuildCache.__evict_scheduled:
+            BuildCache.__evict_scheduled = True
+            atexit.register(BuildCache.evict)
+        return entry
+
+    @staticmethod
+    def store_failure(key: str, message: str):
+        if not BuildCache.enabled:
+            return
+        temp = BuildCache.workspace(tempfile.gettempdir())
+        with open(os.path.join(temp, BuildCache.failure_file), "w") as f:
+            f.write(message)
+        if BuildCache.store(key, temp) == temp:
+            shutil.rmtree(temp, ignore_errors=True)
+
+    # remove the least recently used entries until the cache fits in max_size
+    @staticmethod
+    def evict():
+        def size(folder: str) -> int:
+            total = 0
+            for root, _dirs, files in os.walk(folder):
+                total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+            return total
+
+        try:
+            entries = [os.path.join(BuildCache.folder, e) for e in os.listdir(BuildCache.folder) if not e.startswith(".")]
+            entries = sorted([(os.path.getmtime(e), size(e), e) for e in entries if os.path.isdir(e)])
+        except OSError:  # changed by other tk running at the same time
+            return
+        total = sum(e[1] for e in entries)
+        for _mtime, entry_size, entry in entries:
+            if total <= BuildCache.max_size * 1024 * 1024:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= entry_size
+
+
+class Profile:
+    default = "debug"
+    # flags added to the gcc and g++ calls, each profile has its own entries in the build cache
+    flags: Dict[str, List[str]] = {
+        "debug": [],
+        "release": ["-O2"],
+        "native": ["-O3", "-march=native"],
+        "sanitize": ["-g", "-fsanitize=address,undefined"],
+    }
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def names() -> List[str]:
+        return list(Profile.flags.keys())
+
+    # pgo only pays with optimization, without -O the baseline and the optimized build are the same
+    @staticmethod
+    def optimized(name: str) -> bool:
+        return any(flag.startswith("-O") and flag != "-O0" for flag in Profile.get_flags(name))
+
+    @staticmethod
+    def get_flags(name: str) -> List[str]:
+        if name not in Profile.flags:
+            raise ValueError("fail: build profile " + name + " not found, use one of: " + ", ".join(Profile.names()))
+        return Profile.flags[name]
+
+
 class Solver:
-    def __init__(self, solver_list: List[str]):
+    java_cds: bool = False  # record an AppCDS archive of the java solver in its first execution
+    java_host: bool = False  # experimental, java solvers under --zygote run in a persistent jvm
+
+    def __init__(self, solver_list: List[str], profile: str = Profile.default):
         self.path_list: List[str] = [Solver.__add_dot_bar(path) for path in solver_list]
+        self.profile: str = profile
+        self.profile_flags: List[str] = Profile.get_flags(profile)
+        self.build_args: Optional[Tuple[List[str], List[str]]] = None  # gcc/g++ args before and after the sources
+        self.zygote: Optional[Zygote] = None
+        self.hosts: Optional[queue.Queue] = None  # warm node or java processes
+        self.java_classes: str = ""
+        self.java_main: str = ""
+        self.java_archive: Optional[str] = None  # archive to be recorded by the next execution
+        self.java_archive_lock = threading.Lock()
         
         self.temp_dir = tempfile.mkdtemp()
         # print("Tempdir for execution: " + self.temp_dir)
@@ -212,6 +465,30 @@ class Solver:
         else:
             self.executable = path
 
+    # the units run from a warm interpreter instead of starting a new one each time
+    # python solvers are forked from a zygote, js, ts and java solvers run in persistent hosts
+    # the node and java hosts run all units in one process, so the limits of each execution cannot be applied
+    def start_zygote(self, count: int = 1, limits: Optional[Limits] = None):
+        if self.executable.startswith("python ") and " " not in self.path_list[0]:
+            self.zygote = Zygote(self.path_list[0], self.temp_dir)
+            return
+        if limits is not None and (limits.memory is not None or limits.cpu_time is not None or limits.output is not None):
+            raise ValueError("\nfail: --memory-limit, --cpu-limit and --output-limit are not applied by the js, ts and java "
+                             "zygote, run without --zygote")
+        if self.executable.startswith("node "):
+            self.hosts = queue.Queue()
+            for _ in range(count):
+                self.hosts.put(NodeHost(self.executable[len("node "):], self.temp_dir))
+        elif self.java_main != "":
+            if not Solver.java_host:
+                raise ValueError("\nfail: the java zygote is experimental, enable it with --java-host")
+            harness = JavaHost.compile_harness(self.temp_dir)
+            self.hosts = queue.Queue()
+            for _ in range(count):
+                self.hosts.put(JavaHost(harness, self.java_classes, self.java_main, self.temp_dir))
+        else:
+            raise ValueError("\nfail: zygote is only available for python, js, ts and java solvers")
+
     # @staticmethod
     # def __get_files_by_ext(solver: str) -> List[str]:
     #     basedir = os.path.dirname(solver)
@@ -224,19 +501,75 @@ class Solver:
     #     # print(file_list)
     #     return file_list
 
+    # compile using the cache, the build must write the artifacts in the folder received
+    def __cached_build(self, args: List[str], build, path_list: Optional[List[str]] = None) -> str:
+        key = BuildCache.key(args, self.path_list if path_list is None else path_list)
+        entry = BuildCache.lookup(key)
+        if entry is not None:
+            failure = BuildCache.get_failure(entry)
+            if failure is not None:
+                raise Runner.CompileError(failure)
+            return entry
+        artifacts = BuildCache.workspace(self.temp_dir)
+        try:
+            build(artifacts)
+        except Runner.CompileError as e:
+            shutil.rmtree(artifacts, ignore_errors=True)
+            BuildCache.store_failure(key, str(e))
+            raise
+        return BuildCache.store(key, artifacts)
+
     def __prepare_java(self):
         solver = self.path_list[0]
         filename = os.path.basename(solver)
-        tempdir = os.path.dirname(self.path_list[0])
-        
-        cmd = ["javac"] + self.path_list + ['-d', tempdir]
-        return_code, stdout, stderr = Runner.subprocess_run(cmd)
-        print(stdout)
-        print(stderr)
-        if return_code != 0:
-            raise Runner.CompileError(stdout + stderr)
-        solver = solver.split(os.sep)[-1]  # getting only the filename
-        self.executable =  "java -cp " + tempdir +  " "  + filename[:-5]  # removing the .java
+
+        def build(artifacts: str):
+            cmd = ["javac"] + self.path_list + ['-d', artifacts]
+            return_code, stdout, stderr = Runner.subprocess_run(cmd)
+            print(stdout)
+            print(stderr)
+            if return_code != 0:
+                raise Runner.CompileError(stdout + stderr)
+
+        classes = self.__cached_build(["javac"], build)
+        self.java_classes = classes
+        self.java_main = filename[:-5]  # removing the .java
+        self.executable = " ".join(["java", "-cp", classes, self.java_main])
+        if not Solver.java_cds or not BuildCache.enabled:
+            return
+        archive = os.path.join(classes, "app.jsa")
+        if os.path.isfile(archive):
+            self.__use_archive(archive)
+        elif not os.path.isfile(archive + ".failed") and os.access(classes, os.W_OK):
+            self.java_archive = archive
+
+    # the jvm ignores the archive if it does not match, so old jvms just run without it
+    def __use_archive(self, archive: str):
+        flags = ["-XX:SharedArchiveFile=" + archive, "-Xshare:auto", "-Xlog:disable"]
+        self.executable = " ".join(["java"] + flags + ["-cp", self.java_classes, self.java_main])
+
+    # the command of the next execution, the first java execution also records the AppCDS archive
+    # with the classes loaded by a real case, returning the temporary file it writes at exit
+    def command(self) -> Tuple[List[str], Optional[str]]:
+        with self.java_archive_lock:
+            archive, self.java_archive = self.java_archive, None
+        cmd = self.executable.split(" ")
+        if archive is None:
+            return cmd, None
+        temp = os.path.join(self.java_classes, ".app." + str(os.getpid()) + ".jsa")
+        return cmd[:1] + ["-XX:ArchiveClassesAtExit=" + temp, "-Xlog:disable"] + cmd[1:], temp
+
+    # keep the archive recorded, a killed or failed execution leaves the recording to the next one
+    def store_archive(self, temp: str, info: RunInfo):
+        archive = os.path.join(self.java_classes, "app.jsa")
+        if os.path.isfile(temp):
+            os.replace(temp, archive)
+            self.__use_archive(archive)
+        elif info.return_code == 0 and not info.killed and not info.timeout:
+            open(archive + ".failed", "w").close()  # this jvm does not support the archive
+        else:
+            with self.java_archive_lock:
+                self.java_archive = archive
 
     def __prepare_js(self):
         import_str = r'let __lines = require("fs").readFileSync(0).toString().split("\n"); let input = () => __lines.length === 0 ? "" : __lines.shift(); let write = (text, end="\n") => process.stdout.write("" + text + end);'
@@ -259,40 +592,217 @@ class Solver:
         source_list = self.path_list
         # print("Using the following source files: " + str([os.path.basename(x) for x in source_list]))
         #compile the ts file
-        cmd = ["esbuild"] + source_list + ["--outdir=" + self.temp_dir, "--format=cjs", "--log-level=error"]
-        return_code, stdout, stderr = Runner.subprocess_run(cmd)
-        print(stdout + stderr)
-        if return_code != 0:
-            raise Runner.CompileError(stdout + stderr)
-        jsfile = os.path.join(self.temp_dir, filename[:-3] + ".js")
+        flags = ["--format=cjs", "--log-level=error"]
+
+        # esbuild only transpiles each file, so each output is cached by its own source
+        # and only the changed files are sent to esbuild
+        def output_name(path: str) -> str:
+            return os.path.splitext(os.path.basename(path))[0] + ".js"
+
+        def build(artifacts: str):
+            missing = []
+            for path in source_list:
+                entry = BuildCache.lookup(BuildCache.key(["esbuild"] + flags, [path]))
+                if entry is None:
+                    missing.append(path)
+                else:
+                    shutil.copy(os.path.join(entry, output_name(path)), artifacts)
+            if len(missing) == 0:
+                return
+            outdir = BuildCache.workspace(self.temp_dir)
+            cmd = ["esbuild"] + missing + ["--outdir=" + outdir] + flags
+            return_code, stdout, stderr = Runner.subprocess_run(cmd)
+            print(stdout + stderr)
+            if return_code != 0:
+                shutil.rmtree(outdir, ignore_errors=True)
+                raise Runner.CompileError(stdout + stderr)
+            for path in missing:
+                shutil.copy(os.path.join(outdir, output_name(path)), artifacts)
+                single = BuildCache.workspace(self.temp_dir)
+                shutil.move(os.path.join(outdir, output_name(path)), single)
+                if BuildCache.store(BuildCache.key(["esbuild"] + flags, [path]), single) == single:
+                    shutil.rmtree(single, ignore_errors=True)
+            shutil.rmtree(outdir, ignore_errors=True)
+
+        outdir = self.__cached_build(["esbuild"] + flags, build)
+        jsfile = os.path.join(outdir, filename[:-3] + ".js")
         self.executable = "node " + jsfile  # renaming solver to main
 
 
 
-    def __prepare_c_cpp(self, pre_args: List[str], pos_args: list[str]) -> str:
-        solver = self.path_list[0]
-        tempdir = self.temp_dir
+    def __prepare_c_cpp(self, pre_args: List[str], pos_args: list[str], use_pch: bool = False) -> str:
         source_list = self.path_list
         # print("Using the following source files: " + str([os.path.basename(x) for x in source_list]))
-        
-        exec_path = os.path.join(tempdir, ".a.out")
-        cmd = pre_args + source_list + ["-o", exec_path] + pos_args
+
+        units = [path for path in source_list if path.endswith(".c") or path.endswith(".cpp")]
+        self.build_args = (pre_args, pos_args)
+
+        def build(artifacts: str):
+            exec_path = os.path.join(artifacts, ".a.out")
+            compile_args = pre_args + (self.__precompiled_header(pre_args) if use_pch else [])
+            if len(units) > 1:
+                objects = self.__compile_units(compile_args, units)
+                cmd = pre_args + objects + ["-o", exec_path] + pos_args
+            else:
+                cmd = compile_args + source_list + ["-o", exec_path] + pos_args
+            return_code, stdout, stderr = Runner.subprocess_run(cmd)
+            if return_code != 0:
+                raise Runner.CompileError(stdout + stderr)
+
+        self.executable = os.path.join(self.__cached_build(pre_args + pos_args, build), ".a.out")
+
+    # build or reuse a precompiled header with the system headers included by the solver
+    # return the args to use it, or an empty list to compile the usual way
+    def __precompiled_header(self, pre_args: List[str]) -> List[str]:
+        regex_include = r"^\s*#\s*include\s*<([^>]+)>"
+        headers: List[str] = []
+        for path in self.path_list:
+            with open(path) as f:
+                lines = f.read().splitlines()
+            includes = [i for i, line in enumerate(lines) if re.match(regex_include, line)]
+            if len(includes) == 0:
+                continue
+            # macros defined before the includes may change them, so the pch is not safe
+            if any(re.match(r"^\s*#\s*(define|undef|pragma)", line) for line in lines[:includes[-1]]):
+                return []
+            for i in includes:
+                header = re.match(regex_include, lines[i]).group(1)
+                if header not in headers:
+                    headers.append(header)
+        if len(headers) == 0:
+            return []
+
+        header_path = os.path.join(self.temp_dir, "tk_pch.hpp")
+        with open(header_path, "w") as f:
+            f.write("".join("#include <" + header + ">\n" for header in headers))
+        args = pre_args + ["-x", "c++-header"]
+
+        def build(artifacts: str):
+            shutil.copy(header_path, artifacts)
+            cmd = args + [os.path.join(artifacts, "tk_pch.hpp"), "-o", os.path.join(artifacts, "tk_pch.hpp.gch")]
+            return_code, stdout, stderr = Runner.subprocess_run(cmd)
+            if return_code != 0:
+                raise Runner.CompileError(stdout + stderr)
+
+        try:
+            entry = self.__cached_build(args, build, [header_path])
+        except Runner.CompileError:
+            return []
+        # gcc uses the .gch next to the header and falls back to the header itself if the .gch is invalid
+        return ["-include", os.path.join(entry, "tk_pch.hpp")]
+
+    # profile guided optimization, the stage "generate" builds the instrumented solver
+    # and the stage "use" rebuilds it using the data collected by the executions
+    def prepare_pgo(self, stage: str):
+        if self.build_args is None:
+            raise ValueError("fail: pgo is only available for c/c++ solvers")
+        pre_args, pos_args = self.build_args
+        profile_dir = os.path.join(self.temp_dir, "pgo")
+        flags = ["-fprofile-" + stage + "=" + profile_dir]
+        if stage == "use":
+            flags += ["-fprofile-correction", "-Wno-missing-profile"]
+        units = [path for path in self.path_list if path.endswith(".c") or path.endswith(".cpp")]
+        # both stages must write the same output, gcc names the profile data after it
+        exec_path = os.path.join(self.temp_dir, ".pgo.out")
+        cmd = pre_args + flags + units + ["-o", exec_path] + pos_args
         return_code, stdout, stderr = Runner.subprocess_run(cmd)
         if return_code != 0:
             raise Runner.CompileError(stdout + stderr)
         self.executable = exec_path
 
+    # build with gcov instrumentation, each execution writes its .gcda files in the returned folder
+    def prepare_coverage(self) -> str:
+        if self.build_args is None:
+            raise ValueError("fail: coverage is only available for c/c++ solvers")
+        pre_args, pos_args = self.build_args
+        folder = os.path.join(self.temp_dir, "coverage")
+        os.makedirs(folder, exist_ok=True)
+        units = [path for path in self.path_list if path.endswith(".c") or path.endswith(".cpp")]
+        exec_path = os.path.join(folder, ".cov.out")
+        cmd = pre_args + ["--coverage", "-O0"] + units + ["-o", exec_path] + pos_args
+        return_code, stdout, stderr = Runner.subprocess_run(cmd)
+        if return_code != 0:
+            raise Runner.CompileError(stdout + stderr)
+        self.executable = exec_path
+        return folder
+
+    # compile the translation units in parallel, returning the objects to be linked
+    def __compile_units(self, pre_args: List[str], units: List[str]) -> List[str]:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            futures = [pool.submit(self.__compile_unit, pre_args, unit) for unit in units]
+        objects = []
+        errors = []
+        for future in futures:
+            try:
+                objects.append(future.result())
+            except Runner.CompileError as e:
+                errors.append(str(e))
+        if len(errors) > 0:
+            raise Runner.CompileError("".join(errors))
+        return objects
+
+    # the object is cached by the unit and the headers listed in the depfile of the last compilation
+    def __compile_unit(self, pre_args: List[str], unit: str) -> str:
+        name = os.path.basename(unit)
+        args = pre_args + ["-c"]
+        deps_key = BuildCache.key(args + ["-MMD"], [unit])
+        manifest = BuildCache.lookup(deps_key)
+        if manifest is not None:
+            deps = self.__read_manifest(manifest)
+            if deps is not None:
+                entry = BuildCache.lookup(BuildCache.key(args, [unit] + deps))
+                if entry is not None:
+                    return os.path.join(entry, name + ".o")
+
+        artifacts = BuildCache.workspace(self.temp_dir)
+        obj = os.path.join(artifacts, name + ".o")
+        depfile = os.path.join(artifacts, name + ".d")
+        cmd = args + [unit, "-o", obj, "-MMD", "-MF", depfile]
+        return_code, stdout, stderr = Runner.subprocess_run(cmd)
+        if return_code != 0:
+            shutil.rmtree(artifacts, ignore_errors=True)
+            raise Runner.CompileError(stdout + stderr)
+        deps = self.__parse_depfile(depfile, unit)
+        os.remove(depfile)
+
+        manifest = BuildCache.workspace(self.temp_dir)
+        with open(os.path.join(manifest, "deps"), "w") as f:
+            f.write("\n".join(os.path.basename(dep) for dep in deps))
+        if BuildCache.store(deps_key, manifest, replace=True) == manifest:
+            shutil.rmtree(manifest, ignore_errors=True)
+        entry = BuildCache.store(BuildCache.key(args, [unit] + deps), artifacts)
+        return os.path.join(entry, name + ".o")
+
+    # return the headers of the solver used by the unit, system headers are not listed by -MMD
+    def __parse_depfile(self, depfile: str, unit: str) -> List[str]:
+        with open(depfile) as f:
+            content = f.read().replace("\\\n", " ")
+        rules = content.split(":", 1)
+        if len(rules) < 2:
+            return []
+        paths = rules[1].split("\n")[0].split()
+        return sorted(set(path for path in paths if os.path.dirname(path) == self.temp_dir and path != unit))
+
+    # None if some header listed in the manifest no longer exists
+    def __read_manifest(self, manifest: str) -> Optional[List[str]]:
+        with open(os.path.join(manifest, "deps")) as f:
+            names = [name for name in f.read().split("\n") if name != ""]
+        deps = [os.path.join(self.temp_dir, name) for name in names]
+        if not all(os.path.isfile(dep) for dep in deps):
+            return None
+        return deps
+
     def __prepare_c(self):
         # pre = ["gcc", "-Wall", "-fsanitize=address", "-Wuninitialized", "-Wparentheses", "-Wreturn-type", "-fno-diagnostics-color"] 
-        pre = ["gcc", "-Wall"]
+        pre = ["gcc", "-Wall"] + self.profile_flags
         pos = ["-lm", "-lutil"]
         self.__prepare_c_cpp(pre, pos)
 
     def __prepare_cpp(self: str):
         # pre = ["g++", "-std=c++20", "-Wall", "-g", "-fsanitize=address", "-fsanitize=undefined", "-D_GLIBCXX_DEBUG"] # muito lento no replit
-        pre = ["g++", "-std=c++17", "-Wall", "-Wextra", "-Werror"]
+        pre = ["g++", "-std=c++17", "-Wall", "-Wextra", "-Werror"] + self.profile_flags
         pos = []
-        self.__prepare_c_cpp(pre, pos)
+        self.__prepare_c_cpp(pre, pos, use_pch=BuildCache.enabled)  # without the cache the pch is never reused
 
     @staticmethod
     def __add_dot_bar(solver: str) -> str:
@@ -300,6 +810,84 @@ class Solver:
             solver = "." + os.sep + solver
         return solver
 
+class Budget:
+    regex_time = r"^(\d+(?:\.\d+)?)(ms|s)$"
+    regex_memory = r"^(\d+)MB$"
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def parse_time(text: str) -> Optional[float]:
+        m = re.match(Budget.regex_time, text)
+        if m is None:
+            return None
+        return float(m.group(1)) / (1000 if m.group(2) == "ms" else 1)
+
+    @staticmethod
+    def parse_memory(text: str) -> Optional[int]:
+        m = re.match(Budget.regex_memory, text)
+        return None if m is None else int(m.group(1))
+
+    @staticmethod
+    def show_time(value: float) -> str:
+        return "{:g}ms".format(round(value * 1000, 3))
+
+    @staticmethod
+    def show_memory(value: int) -> str:
+        return str(value) + "MB"
+
+    # remove the budgets from the end of a tio header, like "name 30% 200ms 64MB"
+    @staticmethod
+    def split_header(value: str) -> Tuple[str, Optional[float], Optional[int]]:
+        words = value.split(" ")
+        time_budget: Optional[float] = None
+        memory_budget: Optional[int] = None
+        while len(words) > 0:
+            if time_budget is None and Budget.parse_time(words[-1]) is not None:
+                time_budget = Budget.parse_time(words.pop())
+            elif memory_budget is None and Budget.parse_memory(words[-1]) is not None:
+                memory_budget = Budget.parse_memory(words.pop())
+            elif words[-1] == "":
+                words.pop()
+            else:
+                break
+        return " ".join(words), time_budget, memory_budget
+
+    # the budgets as written in a tio header
+    @staticmethod
+    def header(unit) -> str:
+        words = []
+        if unit.time_budget is not None:
+            words.append(Budget.show_time(unit.time_budget))
+        if unit.memory_budget is not None:
+            words.append(Budget.show_memory(unit.memory_budget))
+        return " ".join(words)
+
+    # the budget lines of a vpl case, that are not part of the case format
+    @staticmethod
+    def vpl_lines(unit) -> str:
+        text = ""
+        if unit.time_budget is not None:
+            text += "time budget=" + Budget.show_time(unit.time_budget) + "\n"
+        if unit.memory_budget is not None:
+            text += "memory budget=" + Budget.show_memory(unit.memory_budget) + "\n"
+        return text
+
+    # what was exceeded, empty if the unit is inside its budgets
+    @staticmethod
+    def exceeded(unit: Unit) -> str:
+        parts = []
+        spent = unit.wall_time
+        if unit.user_time is not None and unit.sys_time is not None:
+            spent = unit.user_time + unit.sys_time
+        if unit.time_budget is not None and spent is not None and spent > unit.time_budget:
+            parts.append("time " + Unit.ms(spent) + " > " + Budget.show_time(unit.time_budget))
+        if unit.memory_budget is not None and unit.peak_rss is not None and unit.peak_rss > unit.memory_budget * 1024:
+            parts.append("memory " + Unit.mb(unit.peak_rss) + " > " + Budget.show_memory(unit.memory_budget))
+        return ", ".join(parts)
+
+
 class VplParser:
     @staticmethod
     def finish(text):
@@ -320,6 +908,8 @@ class VplParser:
             self.input: str = VplParser.finish(inp)
             self.output: str = VplParser.unwrap(VplParser.finish(outp))
             self.grade: Optional[int] = grade
+            self.time_budget: Optional[float] = None
+            self.memory_budget: Optional[int] = None
 
         def __str__(self):
             return "case=" + self.case + '\n' \
@@ -329,6 +919,8 @@ class VplParser:
 
     regex_vpl_basic = r"case= *([ \S]*) *\n *input *=(.*?)^ *output *=(.*)"
     regex_vpl_extended = r"case= *([ \S]*) *\n *input *=(.*?)^ *output *=(.*?)^ *grade *reduction *= *(\S*)% *\n?"
+    regex_vpl_budget = r'^ *(time|memory) *budget *= *([^\s"]*) *$'
+    regex_vpl_grade = r"^ *grade *reduction *="
 
     @staticmethod
     def filter_quotes(x):
@@ -359,22 +951,43 @@ class VplParser:
             return None
         return VplParser.CaseData(m.group(1), m.group(2), m.group(3), None)
 
+    # the budget lines are the last ones of the case, after the output and the grade reduction
+    # a line of the input or of the output that looks like a budget is kept
+    @staticmethod
+    def split_budgets(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+        lines = text.split("\n")
+        budgets: List[Tuple[str, str]] = []
+        index = len(lines)
+        while index > 0:
+            line = lines[index - 1]
+            m = re.match(VplParser.regex_vpl_budget, line)
+            if m is not None:
+                budgets.append((m.group(1), m.group(2)))
+                del lines[index - 1]
+            elif line.strip() != "" and re.match(VplParser.regex_vpl_grade, line) is None:
+                break
+            index -= 1
+        return "\n".join(lines), budgets
+
     @staticmethod
     def parse_vpl(content: str) -> List[CaseData]:
         text_cases = VplParser.split_cases(content)
         seq: List[VplParser.CaseData] = []
 
         for text in text_cases:
+            text, budgets = VplParser.split_budgets(text)
             case = VplParser.extract_extended(text)
-            if case is not None:
-                seq.append(case)
-                continue
-            case = VplParser.extract_basic(text)
-            if case is not None:
-                seq.append(case)
-                continue
-            print("invalid case: " + text)
-            exit(1)
+            if case is None:
+                case = VplParser.extract_basic(text)
+            if case is None:
+                print("invalid case: " + text)
+                exit(1)
+            for kind, value in budgets:
+                if kind == "time":
+                    case.time_budget = Budget.parse_time(value)
+                else:
+                    case.memory_budget = Budget.parse_memory(value)
+            seq.append(case)
         return seq
 
     @staticmethod
@@ -384,10 +997,12 @@ class VplParser:
         text += "output=\"" + unit.output + "\"\n"
         if unit.grade is not None:
             text += "grade reduction=" + str(unit.grade) + "%\n"
+        text += Budget.vpl_lines(unit)
         return text
 
 class Loader:
     regex_tio = r"^ *>>>>>>>> *(.*?)\n(.*?)^ *======== *\n(.*?)^ *<<<<<<<< *\n?"
+    regex_compare = r"^#compare +(\S+) *$"
 
     def __init__(self):
         pass
@@ -465,8 +1080,12 @@ class Loader:
         matches = re.findall(Loader.regex_tio, text, re.MULTILINE | re.DOTALL)
         unit_list = []
         for m in matches:
-            case, grade = parse_case_grade(m[0])
-            unit_list.append(Unit(case, m[1], m[2], grade, source))
+            header, time_budget, memory_budget = Budget.split_header(m[0])
+            case, grade = parse_case_grade(header)
+            unit = Unit(case, m[1], m[2], grade, source)
+            unit.time_budget = time_budget
+            unit.memory_budget = memory_budget
+            unit_list.append(unit)
         return unit_list
 
     @staticmethod
@@ -474,7 +1093,10 @@ class Loader:
         data_list = VplParser.parse_vpl(text)
         output: List[Unit] = []
         for m in data_list:
-            output.append(Unit(m.case, m.input, m.output, m.grade, source))
+            unit = Unit(m.case, m.input, m.output, m.grade, source)
+            unit.time_budget = m.time_budget
+            unit.memory_budget = m.memory_budget
+            output.append(unit)
         return output
 
     @staticmethod
@@ -489,17 +1111,36 @@ class Loader:
                 unit = Unit()
                 unit.source = os.path.join(folder, m.label)
                 unit.grade = 100
-                with open(os.path.join(folder, m.input_file)) as f:
-                    value = f.read()
-                    unit.input = value + ("" if value.endswith("\n") else "\n")
-                with open(os.path.join(folder, m.output_file)) as f:
-                    value = f.read()
-                    unit.output = value + ("" if value.endswith("\n") else "\n")
+                input_file = os.path.join(folder, m.input_file)
+                output_file = os.path.join(folder, m.output_file)
+                if os.path.getsize(input_file) + os.path.getsize(output_file) > LargeCase.size:
+                    unit.input_file, unit.output_file = input_file, output_file
+                else:
+                    with open(input_file) as f:
+                        value = f.read()
+                        unit.input = value + ("" if value.endswith("\n") else "\n")
+                    with open(output_file) as f:
+                        value = f.read()
+                        unit.output = value + ("" if value.endswith("\n") else "\n")
                 unit_list.append(unit)
         except FileNotFoundError as e:
             print(str(e))
         return unit_list
 
+    # the comparator of a test file is defined in a line like "#compare float:1e-9" before the first case
+    @staticmethod
+    def parse_compare(text: str, source: str) -> Optional[str]:
+        header = re.split(r"^ *(?:>>>>>>>>|[Cc]ase *=|#__case)", text, 1, re.MULTILINE)[0]
+        m = re.search(Loader.regex_compare, header, re.MULTILINE)
+        if m is None:
+            return None
+        try:
+            Comparator.get(m.group(1))
+        except ValueError as e:
+            print("warning: " + source + ": " + str(e))
+            return None
+        return m.group(1)
+
     @staticmethod
     def parse_source(source: str) -> List[Unit]:
         if os.path.isdir(source):
@@ -509,19 +1150,22 @@ class Loader:
             #      source = PreScript.process_source(source)
             with open(source) as f:
                 content = f.read()
+            compare = Loader.parse_compare(content, source)
+            tests: List[Unit] = []
             if source.endswith(".vpl"):
-                return Loader.parse_vpl(content, source)
+                tests = Loader.parse_vpl(content, source)
             elif source.endswith(".tio"):
-                return Loader.parse_tio(content, source)
+                tests = Loader.parse_tio(content, source)
             elif source.endswith(".md"):
                 tests = Loader.parse_tio(content, source)
                 tests += Loader.parse_cio(content, source)
-                return tests
             else:
                 print("warning: target format do not supported: " + source)  # make this a raise
+            for unit in tests:
+                unit.compare = compare
+            return tests
         else:
             raise FileNotFoundError('warning: unable to find: ' + source)
-        return []
 
 class DiffMode(Enum):
     FIRST = "MODE: SHOW FIRST FAILURE ONLY"
@@ -538,6 +1182,20 @@ class Param:
             self.label_pattern: Optional[str] = None
             self.is_up_down: bool = False
             self.diff_mode = DiffMode.FIRST
+            self.jobs: int = os.cpu_count() or 1
+            self.limits = Limits()
+            self.profile: str = Profile.default
+            self.pgo: bool = False
+            self.zygote: bool = False
+            self.batch: bool = False
+            self.batch_separator: Optional[str] = None
+            self.compare: Optional[str] = None  # comparator spec, None to use the one of each test file
+            self.fail_fast: bool = False
+            self.cached: bool = False  # reuse the results of the units with the same solver and input
+            self.history: bool = True  # order the execution by the times and verdicts of the last run
+            self.top: Optional[int] = None  # show the resources of each unit and the n slowest and most memory hungry
+            self.profile_solver: Optional[str] = None  # pstats file to save, empty to only show, None to not profile
+            self.profile_folder: Optional[str] = None  # where each unit writes its stats while profiling
 
         def set_index(self, value: Optional[int]):
             self.index: Optional[int] = value
@@ -555,6 +1213,57 @@ class Param:
             self.diff_mode = value
             return self
 
+        def set_jobs(self, value: Optional[int]):
+            if value is not None:
+                self.jobs = max(1, value)
+            return self
+
+        def set_limits(self, value: Limits):
+            self.limits = value
+            return self
+
+        def set_profile(self, value: Optional[str]):
+            if value is not None:
+                self.profile = value
+            return self
+
+        def set_pgo(self, value: bool):
+            self.pgo = value
+            return self
+
+        def set_zygote(self, value: bool):
+            self.zygote = value
+            return self
+
+        def set_batch(self, value: bool, separator: Optional[str] = None):
+            self.batch = value or separator is not None
+            self.batch_separator = separator
+            return self
+
+        def set_compare(self, value: Optional[str]):
+            self.compare = value
+            return self
+
+        def set_fail_fast(self, value: bool):
+            self.fail_fast = value
+            return self
+
+        def set_cached(self, value: bool):
+            self.cached = value
+            return self
+
+        def set_history(self, value: bool):
+            self.history = value
+            return self
+
+        def set_top(self, value: Optional[int]):
+            self.top = value
+            return self
+
+        def set_profile_solver(self, value: Optional[str]):
+            self.profile_solver = value
+            return self
+
     class Manip:
         def __init__(self):
             self.unlabel: bool = False
@@ -604,10 +1313,21 @@ class Wdir:
         self.source_list: List[str] = []
         self.pack_list: List[List[Unit]] = []
         self.unit_list: List[Unit] = []
+        self.profile: str = Profile.default
+        self.compare: Optional[str] = None
+
+    def set_profile(self, profile: str):
+        self.profile = profile
+        return self
+
+    # replace the comparator of all the test files
+    def set_compare(self, compare: Optional[str]):
+        self.compare = compare
+        return self
 
     def set_solver(self, solver_list: List[str]):
         if len(solver_list) > 0:
-            self.solver = Solver(solver_list)
+            self.solver = Solver(solver_list, self.profile)
         return self
 
     def set_sources(self, source_list: List[str]):
@@ -635,6 +1355,9 @@ class Wdir:
         if loading_failures > 0 and loading_failures == len(self.source_list):
             raise FileNotFoundError("failure: none source found")
         self.unit_list = sum(self.pack_list, [])
+        if self.compare is not None:
+            for unit in self.unit_list:
+                unit.compare = self.compare
         self.__number_and_mark_duplicated()
         self.__calculate_grade()
         self.__pad()
@@ -643,7 +1366,7 @@ class Wdir:
     def calc_grade(self) -> int:
         grade = 100
         for case in self.unit_list:
-            if not case.repeated and (case.user is None or case.output != case.user):
+            if not case.repeated and case.result != ExecutionResult.SUCCESS:
                 grade -= case.grade_reduction
         return max(0, grade)
 
@@ -684,7 +1407,7 @@ class Wdir:
         for unit in self.unit_list:
             unit.index = index
             index += 1
-            search = [x for x in new_list if x.input == unit.input]
+            search = [x for x in new_list if x.same_input(unit)]
             if len(search) > 0:
                 unit.repeated = search[0].index
             new_list.append(unit)
@@ -695,7 +1418,7 @@ class Wdir:
         # filtering marked repeated
         self.unit_list = [unit for unit in self.unit_list if unit.repeated is None]
         if param.to_sort:
-            self.unit_list.sort(key=lambda v: len(v.input))
+            self.unit_list.sort(key=lambda v: v.input_size())
         if param.unlabel:
             for unit in self.unit_list:
                 unit.case = ""
@@ -705,9 +1428,22 @@ class Wdir:
                 unit.case = LabelFactory().label(unit.case).index(number).generate()
                 number += 1
 
-    def unit_list_resume(self):
+    def unit_list_resume(self, resources: bool = False):
+        if resources:
+            return "\n".join([Symbol.tab + str(unit) + " " + unit.resources() for unit in self.unit_list])
         return "\n".join([Symbol.tab + str(unit) for unit in self.unit_list])
 
+    # the n slowest and the n most memory hungry units tested
+    def top_resume(self, n: int) -> str:
+        tested = [unit for unit in self.unit_list if unit.result != ExecutionResult.UNTESTED]
+        slowest = sorted([u for u in tested if u.wall_time is not None], key=lambda u: -u.wall_time)[:n]
+        hungry = sorted([u for u in tested if u.peak_rss is not None], key=lambda u: -u.peak_rss)[:n]
+        lines = [Colored.paint("slowest:", Color.GREEN)]
+        lines += [Symbol.tab + "[%s] %s %s" % (str(u.index).zfill(2), u.case.ljust(u.case_pad), u.resources()) for u in slowest]
+        lines += [Colored.paint("memory:", Color.GREEN)]
+        lines += [Symbol.tab + "[%s] %s %s" % (str(u.index).zfill(2), u.case.ljust(u.case_pad), u.resources()) for u in hungry]
+        return "\n".join(lines)
+
     def resume(self) -> str:
         def sources() -> str:
             out = []
@@ -718,98 +1454,1776 @@ class Wdir:
                 out.append(nome + "(" + str(len(self.pack_list[i])).zfill(2) + ")")
             return Colored.paint("sources:", Color.GREEN) + "[" + ", ".join(out) + "]"
 
-        def solvers() -> str:
-            path_list = [] if self.solver is None else self.solver.path_list
-            return Colored.paint("solvers:", Color.GREEN) + "[" + ", ".join([os.path.basename(path) for path in path_list]) + "]"
+        def solvers() -> str:
+            path_list = [] if self.solver is None else self.solver.path_list
+            return Colored.paint("solvers:", Color.GREEN) + "[" + ", ".join([os.path.basename(path) for path in path_list]) + "]"
+
+        def profile() -> str:
+            if self.solver is None:
+                return ""
+            return " " + Colored.paint("profile:", Color.GREEN) + self.solver.profile
+
+
+        folder = os.getcwd().split(os.sep)[-1]
+        tests_count = Colored.paint("tests:", Color.GREEN) + str(len([x for x in self.unit_list if x.repeated is None])).zfill(2)
+
+        return Symbol.opening + folder + " " + tests_count + " " + sources() + " " + solvers() + profile()
+
+
+class LabelFactory:
+    def __init__(self):
+        self._label = ""
+        self._index = -1
+
+    def index(self, value: int):
+        try:
+            self._index = int(value)
+        except ValueError:
+            raise ValueError("Index on label must be a integer")
+        return self
+
+    def label(self, value: str):
+        self._label = value
+        return self
+
+    def generate(self):
+        label = LabelFactory.trim_spaces(self._label)
+        label = LabelFactory.remove_old_index(label)
+        if self._index != -1:
+            index = str(self._index).zfill(2)
+            if label != "":
+                return index + " " + label
+            else:
+                return index
+        return label
+
+    @staticmethod
+    def trim_spaces(text):
+        parts = text.split(" ")
+        parts = [word for word in parts if word != '']
+        return " ".join(parts)
+
+    @staticmethod
+    def remove_old_index(label):
+        split_label = label.split(" ")
+        if len(split_label) > 0:
+            try:
+                int(split_label[0])
+                return " ".join(split_label[1:])
+            except ValueError:
+                return label
+
+
+class Limits:
+    def __init__(self):
+        self.wall_time: Optional[float] = None  # seconds for each solver execution
+        self.cpu_time: Optional[int] = None  # cpu seconds for each solver execution
+        self.global_time: Optional[float] = None  # seconds for the whole run
+        self.deadline: Optional[float] = None  # monotonic instant when the whole run expires
+        self.memory: Optional[int] = None  # address space in MB
+        self.stack: Optional[int] = None  # stack size in MB
+        self.file_size: Optional[int] = None  # size of each file created in MB
+        self.processes: Optional[int] = None  # processes of the user, ignored for root
+        self.output: Optional[int] = None  # MB written by the solver in stdout or stderr
+        self.cpus: Optional[List[int]] = None  # cores where the solver is pinned
+
+    def set_wall_time(self, value: Optional[float]):
+        self.wall_time = value
+        return self
+
+    def set_cpu_time(self, value: Optional[int]):
+        self.cpu_time = value
+        return self
+
+    def set_global_time(self, value: Optional[float]):
+        self.global_time = value
+        return self
+
+    def set_memory(self, value: Optional[int]):
+        self.memory = value
+        return self
+
+    def set_stack(self, value: Optional[int]):
+        self.stack = value
+        return self
+
+    def set_file_size(self, value: Optional[int]):
+        self.file_size = value
+        return self
+
+    def set_processes(self, value: Optional[int]):
+        self.processes = value
+        return self
+
+    def set_output(self, value: Optional[int]):
+        self.output = value
+        return self
+
+    def set_cpus(self, value: Optional[List[int]]):
+        self.cpus = value
+        return self
+
+    # starts the clock of the global time limit
+    def start(self):
+        if self.global_time is not None:
+            self.deadline = time.monotonic() + self.global_time
+        return self
+
+    # seconds the next execution is allowed to run, None means no limit
+    def timeout(self) -> Optional[float]:
+        values = []
+        if self.wall_time is not None:
+            values.append(self.wall_time)
+        if self.deadline is not None:
+            values.append(max(0, self.deadline - time.monotonic()))
+        return min(values) if len(values) > 0 else None
+
+    # the next execution has less time than the wall time limit because of the global time,
+    # a timeout then comes from the moment of the run, not from the solver
+    def cut(self) -> bool:
+        timeout = self.timeout()
+        return timeout is not None and (self.wall_time is None or timeout < self.wall_time)
+
+    # limits for a single execution running count cases
+    def scaled(self, count: int) -> Limits:
+        limits = copy.copy(self)
+        if self.wall_time is not None:
+            limits.wall_time = self.wall_time * count
+        if self.cpu_time is not None:
+            limits.cpu_time = self.cpu_time * count
+        return limits
+
+    # if some limit must be applied in the child, without them the solver is started without
+    # preexec_fn, so python can use vfork and nothing runs in the child after the fork
+    def restricted(self) -> bool:
+        values = [self.cpu_time, self.memory, self.stack, self.file_size, self.processes, self.cpus]
+        return any(value is not None for value in values)
+
+    # executed in the child process before the solver starts
+    def apply(self):
+        if self.cpus is not None and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cpus)
+        if resource is None:
+            return
+        mega = 1024 * 1024
+        if self.cpu_time is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_time, self.cpu_time + 1))
+        if self.memory is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory * mega, self.memory * mega))
+        if self.stack is not None:
+            resource.setrlimit(resource.RLIMIT_STACK, (self.stack * mega, self.stack * mega))
+        if self.file_size is not None:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (self.file_size * mega, self.file_size * mega))
+        if self.processes is not None:
+            resource.setrlimit(resource.RLIMIT_NPROC, (self.processes, self.processes))
+
+    # messages printed by the runtimes when an allocation fails
+    oom_markers = ["MemoryError", "std::bad_alloc", "OutOfMemoryError", "heap out of memory", "Cannot allocate memory"]
+
+    # guess if a failed execution was caused by the memory limit
+    # the limit is on the address space, the resident memory seldom gets near it, because the allocation
+    # that fails is reserved but never touched, so in practice the verdict comes from the runtime messages
+    # peak_rss never counts more than the solver used, the memory of tk is left out by limited_run
+    # a c program that ignores a null from malloc only crashes and is reported as an execution error
+    def memory_exceeded(self, info: RunInfo) -> bool:
+        if self.memory is None or info.return_code == 0:
+            return False
+        if info.peak_rss is not None and info.peak_rss >= self.memory * 1024 * 0.9:
+            return True
+        return any(marker in info.stderr for marker in Limits.oom_markers)
+
+
+class RunInfo:
+    def __init__(self):
+        self.return_code: int = 0
+        self.stdout_data: bytes = b""  # raw output, decoded only if someone reads stdout
+        self.stderr_data: bytes = b""
+        self.__stdout: Optional[str] = None
+        self.__stderr: Optional[str] = None
+        self.timeout: bool = False  # wall or cpu time limit exceeded
+        self.peak_rss: Optional[int] = None  # KB
+        self.cpu_time: float = 0  # user + sys seconds
+        self.user_time: Optional[float] = None  # None when the solver shares a process with others
+        self.sys_time: Optional[float] = None
+        self.wall_time: float = 0  # seconds
+        self.mismatch: Optional[Mismatch] = None  # first mismatch found by the comparator
+        self.killed: bool = False  # killed because the output can no longer match or exceeded the limit
+        self.output_exceeded: bool = False
+        self.matched: Optional[bool] = None  # stdout already compared with the expected, None if not compared yet
+
+    # ru_maxrss comes in KB on linux and in bytes on macos
+    @staticmethod
+    def kilobytes(maxrss: int) -> int:
+        return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+    # invalid bytes are shown as \xNN instead of raising, and a carriage return as \r
+    @staticmethod
+    def decode(data: bytes) -> str:
+        return data.decode(errors="backslashreplace").replace("\r", "\\r")
+
+    @property
+    def stdout(self) -> str:
+        if self.__stdout is None:
+            self.__stdout = RunInfo.decode(self.stdout_data)
+        return self.__stdout
+
+    @stdout.setter
+    def stdout(self, value: str):
+        self.__stdout = value
+
+    @property
+    def stderr(self) -> str:
+        if self.__stderr is None:
+            self.__stderr = RunInfo.decode(self.stderr_data)
+        return self.__stderr
+
+    @stderr.setter
+    def stderr(self, value: str):
+        self.__stderr = value
+
+
+class Mismatch:
+    def __init__(self, index: int, expected: bytes, received: bytes, position: int):
+        self.index = index  # token index, or byte index for the exact comparison
+        self.expected = expected  # token expected, empty if the expected ended
+        self.received = received  # token received, empty if the received ended
+        self.position = position  # bytes of the received before the mismatch
+
+    @staticmethod
+    def show(token: bytes) -> str:
+        if len(token) == 0:
+            return "(end)"
+        if token == Comparator.line_break:
+            return Symbol.newline
+        return RunInfo.decode(token)
+
+    def __str__(self):
+        show = Mismatch.show
+        return "token " + str(self.index + 1) + ": expected " + show(self.expected) + " received " + show(self.received)
+
+
+class Comparator:
+    names = ["exact", "token", "ws", "float"]
+    tolerance: float = 1e-6  # default of float, absolute or relative to the expected
+    # numbers as a judge writes them, python float also takes 1_0, inf and nan
+    regex_number = re.compile(rb"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+    line_break = b"\0"  # token of the line breaks in ws
+    __cache: Dict[str, Comparator] = {}
+
+    # spec is the name, and for float an optional tolerance, like float:1e-9
+    def __init__(self, spec: str = "exact"):
+        name, _sep, value = spec.partition(":")
+        if name not in Comparator.names or (value != "" and name != "float"):
+            raise ValueError("fail: unknown comparator " + spec + ", use one of " + ", ".join(Comparator.names))
+        self.spec = spec
+        self.name = name
+        self.tolerance: Optional[float] = None
+        if name == "float":
+            try:
+                self.tolerance = float(value) if value != "" else Comparator.tolerance
+            except ValueError:
+                raise ValueError("fail: invalid tolerance " + value)
+        # ws keeps the line breaks as tokens, ignoring the spaces and the empty lines
+        self.lines = name == "ws"
+        self.pattern = re.compile(rb"\S+|\n\s*" if self.lines else rb"\S+")
+
+    def __str__(self):
+        return self.spec
+
+    @staticmethod
+    def get(spec: Optional[str]) -> Comparator:
+        spec = spec if spec is not None else "exact"
+        if spec not in Comparator.__cache:
+            Comparator.__cache[spec] = Comparator(spec)
+        return Comparator.__cache[spec]
+
+    # checker of a received stream against the expected, the expected comes in chunks of bytes
+    def checker(self, expected_chunks):
+        if self.name == "exact":
+            return Comparator.Exact(expected_chunks)
+        return Comparator.Tokens(self, expected_chunks)
+
+    def check_text(self, expected: str, received: str) -> Optional[Mismatch]:
+        if self.name == "exact" and expected == received:
+            return None
+        checker = self.checker([expected.encode()])
+        checker.feed(received.encode())
+        checker.finish()
+        return checker.mismatch
+
+    class Exact:
+        def __init__(self, expected_chunks):
+            self.chunks = iter(expected_chunks)
+            self.pending = b""  # expected chunk being compared
+            self.offset = 0  # bytes of pending already compared
+            self.position = 0  # bytes received
+            self.mismatch: Optional[Mismatch] = None
+
+        def __fail(self, expected: bytes, received: bytes):
+            size = len(os.path.commonprefix([expected, received]))
+            position = self.position + size
+            self.mismatch = Mismatch(position, expected[size:size + 1], received[size:size + 1], position)
+
+        # return False on the first different byte
+        def feed(self, data: bytes) -> bool:
+            while len(data) > 0 and self.mismatch is None:
+                if self.offset == len(self.pending):
+                    self.pending, self.offset = next(self.chunks, b""), 0
+                    if len(self.pending) == 0:  # received longer than the expected
+                        self.__fail(b"", data)
+                        break
+                size = min(len(data), len(self.pending) - self.offset)
+                part = self.pending[self.offset:self.offset + size]
+                if part != data[:size]:
+                    self.__fail(part, data[:size])
+                    break
+                self.offset += size
+                self.position += size
+                data = data[size:]
+            return self.mismatch is None
+
+        # return True if all the expected was received
+        def finish(self) -> bool:
+            if self.mismatch is None:
+                rest = self.pending[self.offset:]
+                while len(rest) == 0:
+                    rest = next(self.chunks, None)
+                    if rest is None:
+                        return True
+                self.__fail(rest, b"")
+            return False
+
+    # split a stream of chunks in tokens, a token cut between two chunks is kept for the next one
+    class Splitter:
+        def __init__(self, comparator: Comparator):
+            self.comparator = comparator
+            self.carry = b""
+            self.count = 0  # tokens returned
+            self.start = 0  # position of text in the stream
+            self.text = b""  # the bytes tokenized in the last split
+            self.skip = 0  # tokens dropped at the start of the last split
+
+        # bytes.split does the same as the pattern much faster, the pattern is used only to find positions
+        # and when the text has the byte used to mark the line breaks
+        def split(self, data: bytes, final: bool = False) -> List[bytes]:
+            self.start += len(self.text)
+            self.text = self.carry + data
+            self.carry = b""
+            if not self.comparator.lines:
+                tokens = self.text.split()
+            elif Comparator.line_break not in self.text:
+                text = self.text
+                if re.search(rb"\n\s*\n", text) is not None:  # empty lines are a single line break
+                    text = re.sub(rb"\n\s*", b"\n", text)
+                tokens = text.replace(b"\n", b" " + Comparator.line_break + b" ").split()
+            else:
+                tokens = [Comparator.line_break if token[:1] == b"\n" else token
+                          for token in self.comparator.pattern.findall(self.text)]
+            if not final and len(tokens) > 0:
+                # the last token touches the end of the chunk and can continue in the next one
+                if not self.text[-1:].isspace():
+                    self.carry = tokens.pop()
+                elif self.comparator.lines and tokens[-1] == Comparator.line_break:
+                    tokens.pop()
+                    self.carry = self.text[len(self.text.rstrip()):]
+                self.text = self.text[:len(self.text) - len(self.carry)]
+            self.skip = 0
+            if self.comparator.lines:
+                if self.count == 0 and len(tokens) > 0 and tokens[0] == Comparator.line_break:  # empty lines at the start
+                    tokens = tokens[1:]
+                    self.skip = 1
+                if final and len(tokens) > 0 and tokens[-1] == Comparator.line_break:  # the last line break is optional
+                    tokens.pop()
+            self.count += len(tokens)
+            return tokens
+
+        # position in the stream of the index token returned by the last split
+        def position(self, index: int) -> int:
+            for i, match in enumerate(self.comparator.pattern.finditer(self.text)):
+                if i == index + self.skip:
+                    return self.start + match.start()
+            return self.start + len(self.text)
+
+    # compare token by token without joining the chunks, each chunk is compared in a single batch
+    class Tokens:
+        def __init__(self, comparator: Comparator, expected_chunks):
+            self.comparator = comparator
+            self.chunks = iter(expected_chunks)
+            self.expected = Comparator.Splitter(comparator)
+            self.received = Comparator.Splitter(comparator)
+            self.buffer: List[bytes] = []  # expected tokens not compared yet
+            self.ended = False
+            self.index = 0  # tokens compared
+            self.mismatch: Optional[Mismatch] = None
+
+        def __pull(self, count: int) -> List[bytes]:
+            while len(self.buffer) < count and not self.ended:
+                chunk = next(self.chunks, None)
+                self.ended = chunk is None
+                self.buffer += self.expected.split(chunk if chunk is not None else b"", self.ended)
+            tokens, self.buffer = self.buffer[:count], self.buffer[count:]
+            return tokens
+
+        def __same(self, expected: bytes, received: bytes) -> bool:
+            if expected == received:
+                return True
+            if self.comparator.tolerance is None:
+                return False
+            if Comparator.regex_number.fullmatch(expected) is None or Comparator.regex_number.fullmatch(received) is None:
+                return False
+            try:
+                a, b = float(expected), float(received)
+            except ValueError:
+                return False
+            return abs(a - b) <= self.comparator.tolerance * max(1.0, abs(a))
+
+        def __compare(self, tokens: List[bytes]):
+            if self.mismatch is not None or len(tokens) == 0:
+                return
+            expected = self.__pull(len(tokens))
+            # the whole batch at once, pair by pair only for the tolerance or to find the mismatch
+            if expected == tokens or (len(expected) == len(tokens) and all(map(self.__same, expected, tokens))):
+                self.index += len(tokens)
+                return
+            for i, received in enumerate(tokens):
+                value = expected[i] if i < len(expected) else b""
+                if not self.__same(value, received):
+                    self.mismatch = Mismatch(self.index + i, value, received, self.received.position(i))
+                    return
+
+        def feed(self, data: bytes) -> bool:
+            self.__compare(self.received.split(data))
+            return self.mismatch is None
+
+        def finish(self) -> bool:
+            self.__compare(self.received.split(b"", True))
+            if self.mismatch is None:
+                rest = self.__pull(1)
+                if len(rest) > 0:  # received ended before the expected
+                    self.mismatch = Mismatch(self.index, rest[0], b"", self.received.start + len(self.received.text))
+            return self.mismatch is None
+
+    # position of the index token in the stream, used to show the expected around a mismatch
+    def locate(self, chunks, index: int) -> int:
+        if self.name == "exact":
+            return index
+        splitter = Comparator.Splitter(self)
+        count = 0
+        chunks = iter(chunks)
+        while True:
+            chunk = next(chunks, None)
+            tokens = splitter.split(chunk if chunk is not None else b"", chunk is None)
+            if index < count + len(tokens) or chunk is None:
+                return splitter.position(index - count)
+            count += len(tokens)
+
+
+class OutputMatcher:
+    window: int = 64 * 1024  # bytes kept after the first mismatch
+    grace: float = 0.5  # seconds waiting for the window after the first mismatch before the kill
+
+    # compare the output bytes while they arrive using the checker of a comparator, None only apply the limit
+    def __init__(self, checker=None, limit: Optional[int] = None):
+        self.checker = checker
+        self.limit = limit  # bytes
+        self.parts: List[bytes] = []
+        self.size = 0  # bytes received
+        self.kept = 0  # bytes stored in parts
+        self.room: Optional[int] = None  # bytes to be kept, defined on the first mismatch
+        self.mismatch: Optional[Mismatch] = None
+        self.exceeded = False
+
+    # store the chunk and return False if the solver should be killed
+    # after the first mismatch the solver runs until the window is filled, so the diff shows the lines after it
+    def feed(self, data: bytes) -> bool:
+        if self.mismatch is None and self.checker is not None and not self.checker.feed(data):
+            self.mismatch = self.checker.mismatch
+            self.room = self.size + len(data) + OutputMatcher.window
+        self.size += len(data)
+        room = self.room if self.room is not None else self.size
+        if self.limit is not None:
+            room = min(room, self.limit)
+        if self.kept < room:
+            self.parts.append(data[:room - self.kept])
+            self.kept += len(self.parts[-1])
+        if self.limit is not None and self.size > self.limit:
+            self.exceeded = True
+        if self.exceeded:
+            return False
+        return self.room is None or self.size < self.room
+
+    # called once after the last chunk
+    def matched(self) -> bool:
+        if self.checker is None or self.exceeded:
+            return False
+        if self.mismatch is None and not self.checker.finish():
+            self.mismatch = self.checker.mismatch
+        return self.mismatch is None
+
+    def data(self) -> bytes:
+        return b"".join(self.parts)
+
+
+class LargeCase:
+    size: int = 16 * 1024 * 1024  # bytes, bigger cases run through files instead of pipes and strings
+    chunk: int = 1024 * 1024  # bytes compared at a time, multiple of mmap.ALLOCATIONGRANULARITY
+    context: int = 4096  # bytes before the first mismatch shown in the diff
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def is_large(unit: Unit) -> bool:
+        if unit.input_file is not None or unit.output_file is not None:
+            return True
+        return len(unit.input) + len(unit.output) > LargeCase.size
+
+    # the input file itself or a memory file with the input, the solver reads it without python in the middle
+    @staticmethod
+    def open_input(unit: Unit):
+        if unit.input_file is not None:
+            return open(unit.input_file, "rb")
+        if hasattr(os, "memfd_create"):
+            f = os.fdopen(os.memfd_create("tk_input"), "w+b")
+        else:
+            f = tempfile.TemporaryFile()
+        text = unit.input
+        for i in range(0, len(text), LargeCase.chunk):
+            f.write(text[i:i + LargeCase.chunk].encode())
+        f.seek(0)
+        return f
+
+    # the expected output in bytes, one chunk at a time
+    @staticmethod
+    def expected_chunks(unit: Unit):
+        if unit.output_file is None:
+            text = unit.output
+            for i in range(0, len(text), LargeCase.chunk):
+                yield text[i:i + LargeCase.chunk].encode()
+            return
+        last = b""
+        with open(unit.output_file, "rb") as f:
+            while True:
+                data = f.read(LargeCase.chunk)
+                if len(data) == 0:
+                    break
+                last = data
+                yield data
+        if not last.endswith(b"\n"):  # same as the loader does for the small files
+            yield b"\n"
+
+    # the bytes from begin to end of the expected output
+    @staticmethod
+    def expected_range(unit: Unit, begin: int, end: int) -> bytes:
+        parts = []
+        pos = 0
+        for data in LargeCase.expected_chunks(unit):
+            if pos + len(data) > begin:
+                parts.append(data[max(0, begin - pos):end - pos])
+            pos += len(data)
+            if pos >= end:
+                break
+        return b"".join(parts)
+
+    # map only a window of the file, so the memory used does not grow with the size of the output
+    @staticmethod
+    def read_mapped(f, begin: int, end: int) -> bytes:
+        end = min(end, os.fstat(f.fileno()).st_size)
+        if end <= begin:
+            return b""
+        offset = begin - begin % mmap.ALLOCATIONGRANULARITY
+        with mmap.mmap(f.fileno(), end - offset, access=mmap.ACCESS_READ, offset=offset) as view:
+            return view[begin - offset:]
+
+    # the first mismatch of the received using the comparator of the unit, None if they match
+    @staticmethod
+    def find_mismatch(received, unit: Unit) -> Optional[Mismatch]:
+        checker = Comparator.get(unit.compare).checker(LargeCase.expected_chunks(unit))
+        size = os.fstat(received.fileno()).st_size
+        for pos in range(0, size, LargeCase.chunk):
+            if not checker.feed(LargeCase.read_mapped(received, pos, pos + LargeCase.chunk)):
+                return checker.mismatch
+        return None if checker.finish() else checker.mismatch
+
+    # the start of the line some bytes before the position
+    @staticmethod
+    def line_start(read, pos: int) -> int:
+        begin = max(0, pos - LargeCase.context)
+        if begin > 0:
+            begin += read(begin, pos).find(b"\n") + 1
+        return begin
+
+    # stdout goes to a file, so the output limit is also the limit of the file size
+    # the kernel stops the solver with SIGXFSZ as soon as it writes past it
+    @staticmethod
+    def file_limits(limits: Limits) -> Limits:
+        if limits.output is None or (limits.file_size is not None and limits.file_size < limits.output):
+            return limits
+        return copy.copy(limits).set_file_size(limits.output)
+
+    # stopped by the file size limit, or the whole output written where there is no limit to apply
+    @staticmethod
+    def output_exceeded(limits: Limits, info: RunInfo, size: int) -> bool:
+        if limits.output is None:
+            return False
+        if hasattr(signal, "SIGXFSZ") and info.return_code == -signal.SIGXFSZ:
+            return True
+        cap = limits.output * 1024 * 1024
+        return size > cap or (size == cap and info.return_code != 0)  # EFBIG when SIGXFSZ is ignored
+
+    # stdin comes from a file, stdout goes to a temporary file compared by windows mapped in memory
+    # on a mismatch, only the lines around it are kept, the expected around it goes to unit.preview
+    @staticmethod
+    def run(solver: Solver, unit: Unit, limits: Optional[Limits] = None) -> RunInfo:
+        if limits is None:
+            limits = Limits()
+        cmd = solver.executable.split(" ")
+        with LargeCase.open_input(unit) as stdin, tempfile.TemporaryFile() as stdout:
+            info = Runner.limited_run(cmd, "", LargeCase.file_limits(limits), stdin_file=stdin, stdout_file=stdout)
+            if LargeCase.output_exceeded(limits, info, os.fstat(stdout.fileno()).st_size):
+                info.output_exceeded = True
+                info.killed = True
+            info.mismatch = LargeCase.find_mismatch(stdout, unit)
+            info.matched = info.mismatch is None
+            unit.preview = None
+            if info.mismatch is not None:
+                pos = info.mismatch.position
+                begin = LargeCase.line_start(lambda a, b: LargeCase.read_mapped(stdout, a, b), pos)
+                info.stdout_data = LargeCase.read_mapped(stdout, begin, pos + OutputMatcher.window)
+                # with tokens the expected can be in other position
+                pos = Comparator.get(unit.compare).locate(LargeCase.expected_chunks(unit), info.mismatch.index)
+                begin = LargeCase.line_start(lambda a, b: LargeCase.expected_range(unit, a, b), pos)
+                unit.preview = RunInfo.decode(LargeCase.expected_range(unit, begin, pos + OutputMatcher.window))
+        return info
+
+class Runner:
+
+    def __init__(self):
+        pass
+
+    class CompileError(Exception):
+        pass
+
+    @staticmethod
+    def kill_group(pid: int):
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(pid, signal.SIGKILL)
+            else:  # without process groups only the solver is killed
+                os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
+    # seconds between two reads of the memory of a running solver
+    rss_interval: float = 0.01
+
+    # the high water mark of the resident memory of a running process in KB, None where there is no /proc
+    @staticmethod
+    def read_hwm(pid: int) -> Optional[int]:
+        try:
+            with open("/proc/" + str(pid) + "/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    # executions in flight, all killed by cancel_all
+    __running: Dict[int, Any] = {}
+    __running_lock = threading.Lock()
+    __cancelled = False
+
+    # the kill function is called at once if the executions were cancelled
+    @staticmethod
+    def track(key: int, kill):
+        with Runner.__running_lock:
+            Runner.__running[key] = kill
+            cancelled = Runner.__cancelled
+        if cancelled:
+            kill()
+
+    @staticmethod
+    def untrack(key: int):
+        with Runner.__running_lock:
+            Runner.__running.pop(key, None)
+
+    @staticmethod
+    def cancel_all():
+        with Runner.__running_lock:
+            Runner.__cancelled = True
+            kill_list = list(Runner.__running.values())
+        for kill in kill_list:
+            kill()
+
+    @staticmethod
+    def reset_cancel():
+        with Runner.__running_lock:
+            Runner.__cancelled = False
+
+    # run a solver respecting the limits, the solver and all its children are killed on timeout
+    # stdin_file and stdout_file replace the pipes, so large cases do not pass through python
+    @staticmethod
+    def limited_run(cmd_list: List[str], input_data: str = "", limits: Optional[Limits] = None,
+                    checker=None, stdin_file=None, stdout_file=None) -> RunInfo:
+        if limits is None:
+            limits = Limits()
+        timeout = limits.timeout()
+        if timeout is not None and timeout <= 0:
+            info = RunInfo()
+            info.timeout = True
+            return info
+        start = time.monotonic()
+        try:
+            p = subprocess.Popen(cmd_list, stdout=PIPE if stdout_file is None else stdout_file,
+                                 stdin=PIPE if stdin_file is None else stdin_file, stderr=PIPE,
+                                 start_new_session=hasattr(os, "killpg"),
+                                 preexec_fn=limits.apply if limits.restricted() else None)
+        except FileNotFoundError:
+            print("\n\nCommand not found: " + " ".join(cmd_list))
+            exit(1)
+
+        # linux keeps in ru_maxrss the memory of the tk image that was forked before the exec, so the value
+        # is from the solver only when it is above the peak of tk, below it the solver is measured by
+        # reading its /proc while it runs, Popen returns after the exec, so every read is of the solver
+        peak: List[int] = []
+        done = threading.Event()
+
+        def sample():
+            while True:
+                hwm = Runner.read_hwm(p.pid)
+                if hwm is not None:
+                    peak[:] = [max(peak + [hwm])]
+                if done.wait(Runner.rss_interval):
+                    break
+
+        sampler = None
+        if hasattr(os, "waitid") and os.path.isdir("/proc/self"):
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+
+        # wait4 instead of p.wait to collect the resources used by the solver
+        # without wait4 the time and memory used are not measured
+        def wait() -> Tuple[int, Optional[int], Optional[float], Optional[float]]:
+            if not hasattr(os, "wait4"):
+                return p.wait(), None, None, None
+            if sampler is not None:  # the zombie is kept until the sampler stops, so its pid is not reused
+                os.waitid(os.P_PID, p.pid, os.WEXITED | os.WNOWAIT)
+                done.set()
+                sampler.join()
+            _pid, status, usage = os.wait4(p.pid, 0)
+            p.returncode = os.waitstatus_to_exitcode(status)
+            rss: Optional[int] = RunInfo.kilobytes(usage.ru_maxrss)
+            if sampler is not None and resource is not None:
+                if rss <= RunInfo.kilobytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss):
+                    rss = peak[0] if len(peak) > 0 else None
+            return p.returncode, rss, usage.ru_utime, usage.ru_stime
+
+        return Runner.supervise(p.pid, p.stdin, p.stdout, p.stderr, input_data, limits, timeout, start, wait, checker)
+
+    # the pipes are handled by threads, so a child left behind by the solver holding
+    # the pipes open do not keep the execution waiting after the solver finishes
+    # wait blocks until the solver finishes and returns the exit code, peak rss, user and sys time
+    # stdout is given to the checker of the comparator while it arrives, the solver is killed on the first mismatch
+    # the output is kept in bytes, decoded only if the unit fails
+    @staticmethod
+    def supervise(pid: int, stdin, stdout, stderr, input_data: str, limits: Limits, timeout: Optional[float],
+                  start: float, wait, checker=None) -> RunInfo:
+        info = RunInfo()
+        limit = None if limits.output is None else limits.output * 1024 * 1024
+        matchers = {"stdout": OutputMatcher(checker, limit), "stderr": OutputMatcher(None, limit)}
+
+        def write():
+            if stdin is None:
+                return
+            try:
+                stdin.write(input_data.encode())
+                stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+        grace: List[threading.Timer] = []
+        lock = threading.Lock()
+        finished = threading.Event()  # the solver ended, a late grace timer must not mark it as killed
+
+        def kill():
+            with lock:
+                if not info.killed and not finished.is_set():
+                    info.killed = True
+                    Runner.kill_group(pid)
+
+        # the output after a mismatch is read until the window is filled, the stream ends or the grace expires
+        def read(name, stream):
+            if stream is None:
+                return
+            matcher = matchers[name]
+            alive = True
+            while True:
+                data = os.read(stream.fileno(), 65536)
+                if len(data) == 0:
+                    break
+                if not alive:
+                    continue
+                alive = matcher.feed(data)
+                if not alive:
+                    info.output_exceeded = info.output_exceeded or matcher.exceeded
+                    kill()
+                elif matcher.mismatch is not None and len(grace) == 0:
+                    with lock:
+                        grace.append(threading.Timer(OutputMatcher.grace, kill))
+                        grace[0].start()
+
+        threads = [threading.Thread(target=write),
+                   threading.Thread(target=read, args=("stdout", stdout)),
+                   threading.Thread(target=read, args=("stderr", stderr))]
+        for t in threads:
+            t.start()
+        Runner.track(pid, lambda: Runner.kill_group(pid))
+        timer: Optional[threading.Timer] = None
+        if timeout is not None:
+            def expire():
+                info.timeout = True
+                Runner.kill_group(pid)
+            timer = threading.Timer(timeout, expire)
+            timer.start()
+        info.return_code, info.peak_rss, info.user_time, info.sys_time = wait()
+        if info.user_time is not None and info.sys_time is not None:
+            info.cpu_time = info.user_time + info.sys_time
+        Runner.untrack(pid)
+        info.wall_time = time.monotonic() - start
+        if timer is not None:
+            timer.cancel()
+        with lock:
+            finished.set()
+            for t in grace:
+                t.cancel()
+        Runner.kill_group(pid)  # every child left behind by the solver
+        for t in threads:
+            t.join()
+        for stream in [stdout, stderr]:
+            if stream is not None:
+                stream.close()
+        info.stdout_data = matchers["stdout"].data()
+        info.stderr_data = matchers["stderr"].data()
+        if checker is not None:
+            info.matched = matchers["stdout"].matched()
+            info.mismatch = matchers["stdout"].mismatch
+        if (hasattr(signal, "SIGXCPU") and info.return_code == -signal.SIGXCPU) or (limits.cpu_time is not None and info.cpu_time >= limits.cpu_time):
+            info.timeout = True
+        return info
+
+    @staticmethod
+    def subprocess_run(cmd_list: List[str], input_data: str = "") -> Tuple[int, Any, Any]:
+        try:
+            p = subprocess.Popen(cmd_list, stdout=PIPE, stdin=PIPE, stderr=PIPE, universal_newlines=True,
+                                 errors="backslashreplace")
+            stdout, stderr = p.communicate(input=input_data)
+            return p.returncode, stdout, stderr
+        except FileNotFoundError:
+            print("\n\nCommand not found: " + " ".join(cmd_list))
+            exit(1)
+
+class Zygote:
+    # warm python server, it imports the modules used by the solver once and forks a fresh child for each unit
+    server = r"""
+import ast, importlib, importlib.util, json, os, runpy, signal, socket, sys, traceback
+
+solver, address = os.path.abspath(sys.argv[1]), sys.argv[2]
+folder = os.path.dirname(solver)
+sys.path[0] = folder
+
+# preload only installed modules, the modules of the solver run again in each child
+try:
+    with open(solver) as f:
+        tree = ast.parse(f.read())
+except Exception:
+    tree = ast.Module(body=[], type_ignores=[])
+for node in tree.body:
+    names = []
+    if isinstance(node, ast.Import):
+        names = [alias.name for alias in node.names]
+    elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module is not None:
+        names = [node.module]
+    for name in names:
+        try:
+            spec = importlib.util.find_spec(name.split(".")[0])
+            if spec is None or (spec.origin or "").startswith(folder):
+                continue
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+def apply(limits):
+    import resource
+    mega = 1024 * 1024
+    if limits["cpu_time"] is not None:
+        resource.setrlimit(resource.RLIMIT_CPU, (limits["cpu_time"], limits["cpu_time"] + 1))
+    for key, rlimit, scale in [("memory", resource.RLIMIT_AS, mega), ("stack", resource.RLIMIT_STACK, mega),
+                               ("file_size", resource.RLIMIT_FSIZE, mega), ("processes", resource.RLIMIT_NPROC, 1)]:
+        if limits[key] is not None:
+            resource.setrlimit(rlimit, (limits[key] * scale, limits[key] * scale))
+
+def execute(request, fds):
+    os.setsid()
+    for i, fd in enumerate(fds):
+        os.dup2(fd, i)
+        os.close(fd)
+    apply(request["limits"])
+    sys.stdin = open(0, "r", closefd=False)
+    # keep the behavior of a cold python, the output arrives early for the streaming comparison
+    sys.stdout = open(1, "w", buffering=1 if os.environ.get("PYTHONUNBUFFERED") else -1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+    sys.argv = [solver]
+    if "random" in sys.modules:
+        sys.modules["random"].seed()
+    code = 0
+    try:
+        runpy.run_path(solver, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != solver:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb if tb is not None else e.__traceback__)
+        code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except Exception:
+        pass
+    os._exit(code)
+
+def supervise(conn):
+    data, fds, _flags, _address = socket.recv_fds(conn, 65536, 3)
+    request = json.loads(data.decode())
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        execute(request, fds)
+    for fd in fds:
+        os.close(fd)
+    conn.sendall((str(pid) + "\n").encode())
+    _pid, status, usage = os.wait4(pid, 0)
+    import resource
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # the solver starts with the pages of the warm server, its memory is only known when it grows past them
+    peak = usage.ru_maxrss if usage.ru_maxrss > own else None
+    reply = {"status": status, "peak_rss": peak, "user_time": usage.ru_utime, "sys_time": usage.ru_stime}
+    conn.sendall((json.dumps(reply) + "\n").encode())
+
+signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+server.bind(address)
+server.listen(64)
+print("ready", flush=True)
+while True:
+    conn, _address = server.accept()
+    if os.fork() == 0:
+        server.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        supervise(conn)
+        os._exit(0)
+    conn.close()
+"""
+
+    def __init__(self, solver: str, temp_dir: str):
+        self.address = os.path.join(temp_dir, "zygote.sock")
+        script = os.path.join(temp_dir, "tk_zygote.py")
+        with open(script, "w") as f:
+            f.write(Zygote.server)
+        try:
+            self.process = subprocess.Popen(["python", script, solver, self.address], stdin=subprocess.DEVNULL,
+                                            stdout=PIPE, universal_newlines=True)
+        except FileNotFoundError:
+            print("\n\nCommand not found: python")
+            exit(1)
+        if self.process.stdout.readline().strip() != "ready":
+            raise ValueError("fail: unable to start the python zygote")
+        atexit.register(self.stop)
+
+    def stop(self):
+        self.process.kill()
+        self.process.wait()
+
+    # same as Runner.limited_run, but the solver is forked from the warm server
+    def run(self, input_data: str, limits: Limits, checker=None) -> RunInfo:
+        timeout = limits.timeout()
+        if timeout is not None and timeout <= 0:
+            info = RunInfo()
+            info.timeout = True
+            return info
+        stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        child_fds = [stdin_r, stdout_w, stderr_w]
+        request = {"limits": {"cpu_time": limits.cpu_time, "memory": limits.memory, "stack": limits.stack,
+                              "file_size": limits.file_size, "processes": limits.processes}}
+        start = time.monotonic()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(self.address)
+        socket.send_fds(conn, [json.dumps(request).encode()], child_fds)
+        for fd in child_fds:
+            os.close(fd)
+        reply = conn.makefile("r")
+        pid = int(reply.readline())
+
+        def wait() -> Tuple[int, Optional[int], Optional[float], Optional[float]]:
+            result = json.loads(reply.readline())
+            rss = None if result["peak_rss"] is None else RunInfo.kilobytes(result["peak_rss"])
+            return os.waitstatus_to_exitcode(result["status"]), rss, result["user_time"], result["sys_time"]
+
+        try:
+            return Runner.supervise(pid, open(stdin_w, "wb"), open(stdout_r, "rb"), open(stderr_r, "rb"), input_data, limits,
+                                    timeout, start, wait, checker)
+        finally:
+            reply.close()
+            conn.close()
+
+
+class NodeHost:
+    # persistent node process, the solver is compiled once and each unit runs in a fresh vm context
+    # with require("fs").readFileSync(0), process.stdin, process.stdout and console backed by the unit data
+    # the answer is sent when the timers of the unit are done, like a node process that ends when nothing is pending
+    server = r"""
+const vm = require("vm"), fs = require("fs"), path = require("path"), util = require("util"), readline = require("readline");
+const { Readable } = require("stream");
+const main = path.resolve(process.argv[2]);
+const scripts = {};
+let current = null;
+let abort = () => {};  // ends the current unit after an error outside its timers
+
+class Exit { constructor(code) { this.code = code; } }
+
+function compile(filename) {
+    if (!(filename in scripts)) {
+        const code = fs.readFileSync(filename, "utf8");
+        scripts[filename] = new vm.Script("(function (exports, require, module, __filename, __dirname) {" + code + "\n})", { filename });
+    }
+    return scripts[filename];
+}
+
+function resolve(dir, name) {
+    const base = path.resolve(dir, name);
+    for (const candidate of [base, base + ".js", path.join(base, "index.js")]) {
+        if (fs.existsSync(candidate) && fs.statSync(candidate).isFile()) {
+            return candidate;
+        }
+    }
+    return base;
+}
+
+function makeRequire(context, dir, modules, fakeFs) {
+    return (name) => {
+        if (name === "fs" || name === "node:fs") {
+            return fakeFs;
+        }
+        if (!name.startsWith(".") && !name.startsWith("/")) {
+            return require(name);
+        }
+        return load(context, resolve(dir, name), modules, fakeFs);
+    };
+}
+
+function load(context, filename, modules, fakeFs) {
+    if (filename in modules) {
+        return modules[filename].exports;
+    }
+    const module = { exports: {} };
+    modules[filename] = module;
+    const fn = compile(filename).runInContext(context);
+    const dir = path.dirname(filename);
+    fn.call(module.exports, module.exports, makeRequire(context, dir, modules, fakeFs), module, filename, dir);
+    return module.exports;
+}
+
+function execute(request) {
+    const state = { stdout: [], stderr: [], code: 0, timeout: false };
+    current = state;
+    let done = false, exited = false;
+    const pending = new Set();  // timers of the unit not fired or cleared yet
+    const write = (buffer) => (text) => { buffer.push(String(text)); return true; };
+    const isStdin = (file) => file === 0 || file === "/dev/stdin";
+    const fakeFs = Object.assign({}, fs, {
+        readFileSync: (file, options) => {
+            if (isStdin(file)) {
+                return options ? request.input : Buffer.from(request.input);
+            }
+            return fs.readFileSync(file, options);
+        },
+        readFile: (file, options, callback) => {
+            if (!isStdin(file)) {
+                return fs.readFile(file, options, callback);
+            }
+            const done = typeof options === "function" ? options : callback;
+            const data = typeof options === "function" || !options ? Buffer.from(request.input) : request.input;
+            fakeSetImmediate(() => done(null, data));
+        }
+    });
+    const stdin = Readable.from(request.input.length > 0 ? [Buffer.from(request.input)] : [], { objectMode: false });
+    stdin.fd = 0;
+    const fakeProcess = {
+        argv: [process.argv[0], main], env: process.env, platform: process.platform, exitCode: undefined,
+        stdin, stdout: { write: write(state.stdout) }, stderr: { write: write(state.stderr) },
+        exit: (code) => { throw new Exit(code === undefined ? 0 : code); },
+        on: () => fakeProcess, hrtime: process.hrtime, memoryUsage: process.memoryUsage, nextTick: process.nextTick,
+    };
+    const log = (buffer) => (...args) => { buffer.push(util.format(...args) + "\n"); };
+    const fakeConsole = { log: log(state.stdout), info: log(state.stdout), debug: log(state.stdout), error: log(state.stderr), warn: log(state.stderr) };
+
+    const finish = () => {
+        if (done) {
+            return;
+        }
+        done = true;
+        for (const handle of pending) {
+            clearTimeout(handle);
+            clearInterval(handle);
+            clearImmediate(handle);
+        }
+        if (state.code === 0 && fakeProcess.exitCode !== undefined) {
+            state.code = fakeProcess.exitCode;
+        }
+        current = null;
+        process.stdout.write(JSON.stringify(state) + "\n");
+    };
+    // the promises and ticks queued by the last callback run before the check
+    const reading = () => !stdin.destroyed && (stdin.readableFlowing === true || stdin.listenerCount("readable") > 0);
+    const settle = () => setImmediate(() => { if (exited || (pending.size === 0 && !reading())) { finish(); } });
+    abort = () => { exited = true; settle(); };
+    const call = (fn, args) => {
+        if (done) {
+            return;
+        }
+        try {
+            fn(...args);
+        } catch (e) {
+            fail(state, e);
+            exited = true;
+        }
+    };
+    const fakeSetTimeout = (fn, ms, ...args) => {
+        const handle = setTimeout(() => { pending.delete(handle); call(fn, args); settle(); }, ms);
+        pending.add(handle);
+        return handle;
+    };
+    const fakeSetInterval = (fn, ms, ...args) => {
+        const handle = setInterval(() => { call(fn, args); if (exited) { settle(); } }, ms);
+        pending.add(handle);
+        return handle;
+    };
+    const fakeSetImmediate = (fn, ...args) => {
+        const handle = setImmediate(() => { pending.delete(handle); call(fn, args); settle(); });
+        pending.add(handle);
+        return handle;
+    };
+    const clear = (native) => (handle) => { pending.delete(handle); native(handle); settle(); };
+    const context = vm.createContext({
+        process: fakeProcess, console: fakeConsole, Buffer,
+        setTimeout: fakeSetTimeout, setInterval: fakeSetInterval, setImmediate: fakeSetImmediate,
+        clearTimeout: clear(clearTimeout), clearInterval: clear(clearInterval), clearImmediate: clear(clearImmediate),
+        queueMicrotask, TextEncoder, TextDecoder, URL,
+    });
+    context.__tk_main = () => load(context, main, {}, fakeFs);
+    try {
+        new vm.Script("__tk_main()").runInContext(context, request.timeout > 0 ? { timeout: request.timeout } : {});
+    } catch (e) {
+        fail(state, e);
+        exited = true;
+    }
+    // the reading of process.stdin and the pending promises run before the answer
+    stdin.on("close", settle);
+    settle();
+}
+
+function fail(state, e) {
+    if (e instanceof Exit) {
+        state.code = e.code;
+    } else if (e && e.code === "ERR_SCRIPT_EXECUTION_TIMEOUT") {
+        state.timeout = true;
+    } else {
+        state.stderr.push((e && e.stack ? e.stack : String(e)) + "\n");
+        state.code = 1;
+    }
+}
+
+process.on("uncaughtException", (e) => { if (current !== null) { fail(current, e); abort(); } });
+process.on("unhandledRejection", (e) => { if (current !== null) { fail(current, e); abort(); } });
+readline.createInterface({ input: process.stdin, terminal: false }).on("line", (line) => execute(JSON.parse(line)));
+"""
+
+    def __init__(self, jsfile: str, temp_dir: str):
+        self.jsfile = jsfile
+        self.script = os.path.join(temp_dir, "tk_node_host.js")
+        with open(self.script, "w") as f:
+            f.write(NodeHost.server)
+        self.process: Optional[subprocess.Popen] = None
+        self.start()
+        atexit.register(self.stop)
+
+    def start(self):
+        try:
+            self.process = subprocess.Popen(["node", self.script, self.jsfile], stdin=PIPE, stdout=PIPE,
+                                            stderr=subprocess.DEVNULL, universal_newlines=True, start_new_session=True)
+        except FileNotFoundError:
+            print("\n\nCommand not found: node")
+            exit(1)
+
+    def stop(self):
+        if self.process is not None:
+            Runner.kill_group(self.process.pid)
+            self.process.wait()
+
+    # the vm timeout stops synchronous loops, the host is restarted if it stops answering
+    def run(self, input_data: str, limits: Limits) -> RunInfo:
+        info = RunInfo()
+        timeout = limits.timeout()
+        if timeout is not None and timeout <= 0:
+            info.timeout = True
+            return info
+        request = {"input": input_data, "timeout": 0 if timeout is None else max(1, int(timeout * 1000))}
+        start = time.monotonic()
+        timer: Optional[threading.Timer] = None
+        if timeout is not None:
+            timer = threading.Timer(timeout + 1, self.stop)
+            timer.start()
+        Runner.track(id(self), self.stop)
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (BrokenPipeError, OSError):
+            line = ""
+        Runner.untrack(id(self))
+        if timer is not None:
+            timer.cancel()
+        info.wall_time = time.monotonic() - start
+        if line == "":  # the host died or was stopped by the timer
+            info.timeout = timeout is not None and info.wall_time >= timeout
+            info.return_code = 1
+            self.stop()
+            self.start()
+            return info
+        reply = json.loads(line)
+        info.stdout = "".join(reply["stdout"])
+        info.stderr = "".join(reply["stderr"])
+        info.return_code = int(reply["code"]) if isinstance(reply["code"], int) else 1
+        info.timeout = reply["timeout"]
+        return info
+
+
+class JavaHost:
+    # persistent jvm, main is called again for each unit with System.in, System.out and System.err
+    # redirected to files, the classes of the solver are loaded again to reset the static fields
+    harness = r"""
+import java.io.*;
+import java.lang.reflect.*;
+import java.net.*;
+
+public class TkHarness {
+    static PrintStream out = null;
+    static PrintStream err = null;
+
+    public static void main(String[] args) throws Exception {
+        URL[] classpath = { new File(args[0]).toURI().toURL() };
+        PrintStream protocol = System.out;
+        BufferedReader requests = new BufferedReader(new InputStreamReader(System.in));
+        // System.exit called by the solver ends the host, the output is saved before
+        Runtime.getRuntime().addShutdownHook(new Thread(() -> {
+            if (out != null) out.flush();
+            if (err != null) err.flush();
+        }));
+        String line;
+        while ((line = requests.readLine()) != null) {
+            String[] files = line.split("\t");
+            int code = 0;
+            InputStream in = new BufferedInputStream(new FileInputStream(files[0]));
+            out = new PrintStream(new BufferedOutputStream(new FileOutputStream(files[1])), false);
+            err = new PrintStream(new FileOutputStream(files[2]), true);
+            System.setIn(in);
+            System.setOut(out);
+            System.setErr(err);
+            try (URLClassLoader loader = new URLClassLoader(classpath, TkHarness.class.getClassLoader())) {
+                Method method = loader.loadClass(args[1]).getMethod("main", String[].class);
+                // a package private class is in other runtime package than the harness
+                method.setAccessible(true);
+                method.invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                err.print("Exception in thread \"main\" ");
+                e.getCause().printStackTrace(err);
+                code = 1;
+            } catch (Throwable e) {
+                e.printStackTrace(err);
+                code = 1;
+            }
+            out.close();
+            err.close();
+            in.close();
+            protocol.println(code);
+            protocol.flush();
+        }
+    }
+}
+"""
+
+    def __init__(self, harness: str, classes: str, main: str, temp_dir: str):
+        self.cmd = ["java", "-cp", harness, "TkHarness", classes, main]
+        self.temp_dir = temp_dir
+        self.process: Optional[subprocess.Popen] = None
+        self.start()
+        atexit.register(self.stop)
+
+    # the harness is compiled apart from the solver, so the solver classes are loaded only by the harness
+    @staticmethod
+    def compile_harness(temp_dir: str) -> str:
+        source = os.path.join(tempfile.mkdtemp(dir=temp_dir), "TkHarness.java")
+        with open(source, "w") as f:
+            f.write(JavaHost.harness)
+        key = BuildCache.key(["javac"], [source])
+        entry = BuildCache.lookup(key)
+        if entry is not None:
+            return entry
+        artifacts = BuildCache.workspace(temp_dir)
+        return_code, stdout, stderr = Runner.subprocess_run(["javac", source, "-d", artifacts])
+        if return_code != 0:
+            raise Runner.CompileError(stdout + stderr)
+        return BuildCache.store(key, artifacts)
 
+    def start(self):
+        try:
+            self.process = subprocess.Popen(self.cmd, stdin=PIPE, stdout=PIPE, stderr=subprocess.DEVNULL,
+                                            universal_newlines=True, start_new_session=True)
+        except FileNotFoundError:
+            print("\n\nCommand not found: java")
+            exit(1)
 
-        folder = os.getcwd().split(os.sep)[-1]
-        tests_count = Colored.paint("tests:", Color.GREEN) + str(len([x for x in self.unit_list if x.repeated is None])).zfill(2)
+    def stop(self):
+        if self.process is not None:
+            Runner.kill_group(self.process.pid)
+            self.process.wait()
+
+    def run(self, input_data: str, limits: Limits) -> RunInfo:
+        info = RunInfo()
+        timeout = limits.timeout()
+        if timeout is not None and timeout <= 0:
+            info.timeout = True
+            return info
+        folder = tempfile.mkdtemp(dir=self.temp_dir)
+        files = [os.path.join(folder, name) for name in ["input", "stdout", "stderr"]]
+        with open(files[0], "w") as f:
+            f.write(input_data)
+        start = time.monotonic()
+        timer: Optional[threading.Timer] = None
+        if timeout is not None:
+            def expire():
+                info.timeout = True
+                self.stop()
+            timer = threading.Timer(timeout, expire)
+            timer.start()
+        Runner.track(id(self), self.stop)
+        try:
+            self.process.stdin.write("\t".join(files) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (BrokenPipeError, OSError):
+            line = ""
+        Runner.untrack(id(self))
+        if timer is not None:
+            timer.cancel()
+        info.wall_time = time.monotonic() - start
+        if line == "":  # System.exit or timeout, the exit code of the host is the code of the solver
+            info.return_code = self.process.wait()
+            self.stop()
+            self.start()
+        else:
+            info.return_code = int(line)
+        for name, path in [("stdout_data", files[1]), ("stderr_data", files[2])]:
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    setattr(info, name, f.read())
+        shutil.rmtree(folder, ignore_errors=True)
+        return info
 
-        return Symbol.opening + folder + " " + tests_count + " " + sources() + " " + solvers()
 
+class History:
+    filename = ".tk_history"  # stored in the folder of the test files
 
-class LabelFactory:
     def __init__(self):
-        self._label = ""
-        self._index = -1
+        pass
 
-    def index(self, value: int):
-        try:
-            self._index = int(value)
-        except ValueError:
-            raise ValueError("Index on label must be a integer")
-        return self
+    @staticmethod
+    def path(unit: Unit) -> str:
+        return os.path.join(os.path.dirname(unit.source), History.filename)
 
-    def label(self, value: str):
-        self._label = value
-        return self
+    # cases are identified by the input, so renaming or moving a case keeps its history
+    @staticmethod
+    def key(unit: Unit) -> str:
+        if unit.input_file is not None:
+            return "file:" + os.path.basename(unit.input_file) + ":" + str(unit.input_size())
+        return hashlib.sha256(unit.input.encode()).hexdigest()[:24]
 
-    def generate(self):
-        label = LabelFactory.trim_spaces(self._label)
-        label = LabelFactory.remove_old_index(label)
-        if self._index != -1:
-            index = str(self._index).zfill(2)
-            if label != "":
-                return index + " " + label
-            else:
-                return index
-        return label
+    @staticmethod
+    def load(path: str) -> Dict[str, Dict]:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
 
+    # the last time and verdict of each case, as the solver was in the last run
     @staticmethod
-    def trim_spaces(text):
-        parts = text.split(" ")
-        parts = [word for word in parts if word != '']
-        return " ".join(parts)
+    def read(unit_list: List[Unit]) -> Dict[str, Dict]:
+        history: Dict[str, Dict] = {}
+        for path in sorted(set(History.path(unit) for unit in unit_list)):
+            history.update(History.load(path))
+        return history
+
+    # previous failures first, then the longest cases, so the parallel run ends sooner
+    # cases without history go before the ones known to pass
+    @staticmethod
+    def schedule(unit_list: List[Unit]) -> List[Unit]:
+        history = History.read(unit_list)
+
+        def priority(unit: Unit):
+            entry = history.get(History.key(unit))
+            if entry is None:
+                return (1, 0.0)
+            if entry.get("failed", False):
+                return (0, -entry.get("time", 0.0))
+            return (2, -entry.get("time", 0.0))
+        return sorted(unit_list, key=priority)
 
     @staticmethod
-    def remove_old_index(label):
-        split_label = label.split(" ")
-        if len(split_label) > 0:
+    def save(unit_list: List[Unit]):
+        for path in sorted(set(History.path(unit) for unit in unit_list)):
+            history = History.load(path)
+            for unit in unit_list:
+                if History.path(unit) != path or unit.result == ExecutionResult.UNTESTED:
+                    continue
+                time = unit.wall_time if unit.wall_time is not None else 0.0
+                history[History.key(unit)] = {"time": round(time, 4), "failed": unit.result != ExecutionResult.SUCCESS}
             try:
-                int(split_label[0])
-                return " ".join(split_label[1:])
-            except ValueError:
-                return label
+                fd, temp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(history, f, indent=0, sort_keys=True)
+                os.replace(temp, path)
+            except OSError:  # read only folders keep running without history
+                pass
 
 
-class Runner:
+class ResultCache:
+    max_size: int = 256  # MB
+    folder: str = os.path.join(os.path.dirname(BuildCache.folder), "results")
 
     def __init__(self):
         pass
 
-    class CompileError(Exception):
-        pass
+    # the executable built or the interpreted sources, with the version of the interpreter
+    # the temporary folder of the solver changes on each run, so files are hashed by content
+    @staticmethod
+    def solver_key(solver: Solver) -> str:
+        digest = hashlib.sha256()
+        for path in solver.path_list:
+            digest.update(b"\0" + os.path.basename(path).encode() + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        for token in solver.executable.split(" "):
+            if os.path.isfile(token):
+                with open(token, "rb") as f:
+                    digest.update(b"\0" + f.read())
+            elif token == solver.executable.split(" ")[0]:
+                digest.update(b"\0" + BuildCache.toolchain_version(token).encode())
+            else:
+                digest.update(b"\0" + token.replace(solver.temp_dir, "").encode())
+        return digest.hexdigest()
 
+    # the limits are in the key, a timeout with other limits is not the same result
     @staticmethod
-    def subprocess_run(cmd_list: List[str], input_data: str = "") -> Tuple[int, Any, Any]:
+    def key(solver_key: str, unit: Unit, limits: Limits) -> str:
+        digest = hashlib.sha256(solver_key.encode())
+        values = [limits.wall_time, limits.cpu_time, limits.memory, limits.stack, limits.file_size,
+                  limits.processes, limits.output]
+        digest.update(str(values).encode() + b"\0")
+        digest.update(unit.input.encode())
+        return digest.hexdigest()
+
+    # a killed run has a partial output, it is only valid for the same expected output
+    @staticmethod
+    def expected_key(unit: Unit) -> str:
+        return hashlib.sha256((str(unit.compare) + "\0" + unit.output).encode()).hexdigest()
+
+    # the run stored, judged again because the expected output can be changed after it
+    @staticmethod
+    def load(key: str, unit: Unit) -> Optional[RunInfo]:
+        path = os.path.join(ResultCache.folder, key + ".json")
         try:
-            p = subprocess.Popen(cmd_list, stdout=PIPE, stdin=PIPE, stderr=PIPE, universal_newlines=True)
-            stdout, stderr = p.communicate(input=input_data)
-            return p.returncode, stdout, stderr
-        except FileNotFoundError:
-            print("\n\nCommand not found: " + " ".join(cmd_list))
-            exit(1)
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data["killed"] and data["expected"] != ResultCache.expected_key(unit):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        info = RunInfo()
+        info.return_code = data["return_code"]
+        info.timeout = data["timeout"]
+        info.peak_rss = data["peak_rss"]
+        info.cpu_time = data["cpu_time"]
+        info.user_time = data.get("user_time")
+        info.sys_time = data.get("sys_time")
+        info.wall_time = data["wall_time"]
+        info.stdout_data = data["stdout"].encode("latin-1")  # latin-1 keeps any byte
+        info.stderr_data = data["stderr"].encode("latin-1")
+        info.killed = data["killed"]
+        info.output_exceeded = data["output_exceeded"]
+        if data["mismatch"] is not None:
+            index, expected, received, position = data["mismatch"]
+            info.mismatch = Mismatch(index, expected.encode("latin-1"), received.encode("latin-1"), position)
+        return info
+
+    @staticmethod
+    def store(key: str, unit: Unit, info: RunInfo):
+        mismatch = None
+        if info.killed and info.mismatch is not None:
+            m = info.mismatch
+            mismatch = [m.index, m.expected.decode("latin-1"), m.received.decode("latin-1"), m.position]
+        data = {"return_code": info.return_code, "timeout": info.timeout, "peak_rss": info.peak_rss,
+                "cpu_time": info.cpu_time, "user_time": info.user_time, "sys_time": info.sys_time, "wall_time": info.wall_time,
+                "stdout": info.stdout_data.decode("latin-1"), "stderr": info.stderr_data.decode("latin-1"),
+                "killed": info.killed, "output_exceeded": info.output_exceeded, "mismatch": mismatch,
+                "expected": ResultCache.expected_key(unit) if info.killed else ""}
+        try:
+            os.makedirs(ResultCache.folder, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=ResultCache.folder, prefix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(temp, os.path.join(ResultCache.folder, key + ".json"))
+        except OSError:
+            pass
+
+    # remove the least recently used entries until the cache fits in max_size
+    @staticmethod
+    def evict():
+        if not os.path.isdir(ResultCache.folder):
+            return
+        entries = [os.path.join(ResultCache.folder, e) for e in os.listdir(ResultCache.folder) if not e.startswith(".")]
+        entries = sorted([(os.path.getmtime(e), os.path.getsize(e), e) for e in entries])
+        total = sum(e[1] for e in entries)
+        for _mtime, entry_size, entry in entries:
+            if total <= ResultCache.max_size * 1024 * 1024:
+                break
+            os.remove(entry)
+            total -= entry_size
+
+
+class Profiler:
+    top: int = 15  # functions shown in the report
+    cases: int = 3  # cases shown for each function
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def path(folder: str, unit: Unit) -> str:
+        return os.path.join(folder, str(unit.index).zfill(3) + ".prof")
+
+    # a copy of the solver running under cProfile, with the stats of the unit in its own file
+    @staticmethod
+    def solver(solver: Solver, folder: str, unit: Unit) -> Solver:
+        profiled = copy.copy(solver)
+        profiled.executable = "python -m cProfile -o " + Profiler.path(folder, unit) + solver.executable[len("python"):]
+        profiled.zygote = None
+        profiled.hosts = None
+        return profiled
+
+    @staticmethod
+    def name(func: Tuple[str, int, str]) -> str:
+        filename, line, function = func
+        if filename == "~":  # built-in functions
+            return function
+        return os.path.basename(filename) + ":" + str(line) + "(" + function + ")"
+
+    # the hottest functions by own time merged over all units, with the cases where each one spent most
+    @staticmethod
+    def report(folder: str, unit_list: List[Unit], save: Optional[str]) -> str:
+        per_unit: List[Tuple[Unit, Dict]] = []
+        total: Optional[pstats.Stats] = None
+        for unit in unit_list:
+            path = Profiler.path(folder, unit)
+            if not os.path.isfile(path):  # killed before writing the stats
+                continue
+            per_unit.append((unit, pstats.Stats(path).stats))
+            if total is None:
+                total = pstats.Stats(path)  # loaded again, add changes the stats in place
+            else:
+                total.add(path)
+        if total is None:
+            return Colored.paint("fail:", Color.RED) + " no profile collected\n"
+        if save:
+            total.dump_stats(save)
+
+        hottest = sorted(total.stats.items(), key=lambda x: -x[1][2])[:Profiler.top]
+        lines = [Colored.paint("profile:", Color.GREEN) + " units:" + str(len(per_unit)).zfill(2) +
+                 " total:" + Unit.ms(total.total_tt) + ("" if not save else " saved:" + save)]
+        for func, (_cc, calls, own, cumulative, _callers) in hottest:
+            cases = sorted([(stats[func][2], unit) for unit, stats in per_unit if func in stats], key=lambda x: -x[0])
+            shown = " ".join("[%s]%s" % (str(unit.index).zfill(2), Unit.ms(t)) for t, unit in cases[:Profiler.cases])
+            lines.append(Symbol.tab + "own:%s cum:%s calls:%s %s  %s" % (Unit.ms(own).rjust(9), Unit.ms(cumulative).rjust(9),
+                                                                       str(calls).rjust(8), Profiler.name(func), shown))
+        lines.append(Colored.paint("hottest by case:", Color.GREEN))
+        for unit, stats in per_unit:
+            func, values = max(stats.items(), key=lambda x: x[1][2])
+            spent = sum(v[2] for v in stats.values())
+            lines.append(Symbol.tab + "[%s] %s total:%s %s %s" % (str(unit.index).zfill(2), unit.case.ljust(unit.case_pad),
+                                                                 Unit.ms(spent).rjust(9), Profiler.name(func), Unit.ms(values[2])))
+        return "\n".join(lines) + "\n"
+
 
 class Execution:
 
     def __init__(self):
         pass
 
-    # run a unit using a solver and return if the result is correct
+    # run the solver once with the input received
     @staticmethod
-    def run_unit(solver: Solver, unit: Unit) -> ExecutionResult:
-        cmd = solver.executable.split(" ")
-        return_code, stdout, stderr = Runner.subprocess_run(cmd, unit.input)
-        unit.user = stdout + stderr
-        if return_code != 0:
+    def invoke(solver: Solver, input_data: str, limits: Optional[Limits] = None, checker=None) -> RunInfo:
+        if solver.zygote is not None:
+            return solver.zygote.run(input_data, limits if limits is not None else Limits(), checker)
+        if solver.hosts is not None:
+            host = solver.hosts.get()
+            try:
+                return host.run(input_data, limits if limits is not None else Limits())
+            finally:
+                solver.hosts.put(host)
+        cmd, archive = solver.command()
+        info = Runner.limited_run(cmd, input_data, limits, checker)
+        if archive is not None:
+            solver.store_archive(archive, info)
+        return info
+
+    # store the received output in the unit and return the verdict
+    # received None means stdout followed by stderr, decoded only if stdout was not already matched
+    # unit.user stays None for a matched output, it is equal to the expected
+    @staticmethod
+    def judge(unit: Unit, info: RunInfo, received: Optional[str] = None, limits: Optional[Limits] = None) -> ExecutionResult:
+        unit.peak_rss = info.peak_rss
+        unit.wall_time = info.wall_time
+        unit.user_time = info.user_time
+        unit.sys_time = info.sys_time
+        failed = info.timeout or info.return_code != 0 or (limits is not None and limits.memory_exceeded(info))
+        if received is None and info.matched and len(info.stderr_data) == 0 and not failed:
+            unit.user = None
+            unit.mismatch = None
+            return Execution.check_budget(unit, info)
+        unit.user = received if received is not None else info.stdout + info.stderr
+        if info.timeout:
+            unit.user += Symbol.timeout
+            return ExecutionResult.TIME_LIMIT_EXCEEDED
+        if limits is not None and limits.memory_exceeded(info):
+            unit.user += Symbol.memory
+            return ExecutionResult.MEMORY_LIMIT_EXCEEDED
+        unit.mismatch = info.mismatch
+        if info.killed or info.output_exceeded:  # the output is partial
+            return ExecutionResult.WRONG_OUTPUT
+        if info.return_code != 0:
             unit.user += Symbol.execution
             return ExecutionResult.EXECUTION_ERROR
-        if unit.user == unit.output:
-            return ExecutionResult.SUCCESS
+        if info.matched is None:
+            unit.mismatch = Comparator.get(unit.compare).check_text(unit.output, unit.user)
+            if unit.mismatch is None:
+                return Execution.check_budget(unit, info)
         return ExecutionResult.WRONG_OUTPUT
 
+    # a right answer out of the budget of the case keeps the output to be shown in the diff
+    @staticmethod
+    def check_budget(unit: Unit, info: RunInfo) -> ExecutionResult:
+        if Budget.exceeded(unit) == "":
+            return ExecutionResult.SUCCESS
+        if LargeCase.is_large(unit):  # only the budget is shown, not the whole output
+            unit.preview = ""
+            unit.user = ""
+        elif unit.user is None:
+            unit.user = info.stdout + info.stderr
+        unit.user += Symbol.budget
+        return ExecutionResult.BUDGET_EXCEEDED
+
+    # run a unit using a solver, the output is compared while it arrives
+    @staticmethod
+    def execute(solver: Solver, unit: Unit, limits: Optional[Limits] = None) -> RunInfo:
+        if LargeCase.is_large(unit):
+            return LargeCase.run(solver, unit, limits)
+        checker = Comparator.get(unit.compare).checker([unit.output.encode()])
+        return Execution.invoke(solver, unit.input, limits, checker)
+
+    # run a unit using a solver and return if the result is correct
+    @staticmethod
+    def run_unit(solver: Solver, unit: Unit, limits: Optional[Limits] = None) -> ExecutionResult:
+        return Execution.judge(unit, Execution.execute(solver, unit, limits), None, limits)
 
+    # split the output of a batch, returning the output of each unit and how many units were completed
+    # without separator, each unit receives the same number of lines of its expected output
+    @staticmethod
+    def split_batch(stdout: str, unit_list: List[Unit], separator: Optional[str]) -> Tuple[List[str], int]:
+        lines = stdout.splitlines(keepends=True)
+        parts: List[str] = []
+        if separator is None:
+            pos = 0
+            for unit in unit_list:
+                size = len(unit.output.splitlines())
+                if pos + size > len(lines):
+                    break
+                parts.append("".join(lines[pos:pos + size]))
+                pos += size
+            rest = "".join(lines[pos:])
+        else:
+            current = ""
+            for line in lines:
+                if line.rstrip("\n") == separator and len(parts) < len(unit_list):
+                    parts.append(current)
+                    current = ""
+                else:
+                    current += line
+            rest = current
+        return parts + [rest], len(parts)
+
+    # run all units in a single process, the input starts with the number of cases
+    # or has the separator line after each case, and the solver must print the separator after each answer
+    # if the solver fails, the failure goes to the unit being processed and a new batch starts after it
+    # with fail_fast, the units after the first failure stay untested
+    @staticmethod
+    def run_batch(solver: Solver, unit_list: List[Unit], limits: Limits, separator: Optional[str] = None,
+                  fail_fast: bool = False):
+        pending = list(unit_list)
+        while len(pending) > 0:
+            if separator is None:
+                input_data = str(len(pending)) + "\n" + "".join(unit.input for unit in pending)
+            else:
+                input_data = "".join(unit.input + separator + "\n" for unit in pending)
+            info = Execution.invoke(solver, input_data, limits.scaled(len(pending)))
+            parts, completed = Execution.split_batch(info.stdout, pending, separator)
+            parts += [""] * (len(pending) + 1 - len(parts))
+            failed = info.timeout or info.return_code != 0 or limits.memory_exceeded(info)
+            last = min(completed, len(pending) - 1) if failed else len(pending) - 1
+            parts[last] = "".join(parts[last:])  # the remaining output goes to the last unit processed
+            for i in range(last):
+                pending[i].result = Execution.judge(pending[i], RunInfo(), parts[i])
+            pending[last].result = Execution.judge(pending[last], info, parts[last] + info.stderr, limits)
+            judged, pending = pending[:last + 1], pending[last + 1:]
+            failures = [i for i, unit in enumerate(judged) if unit.result != ExecutionResult.SUCCESS]
+            if fail_fast and len(failures) > 0:
+                for unit in judged[failures[0] + 1:]:
+                    unit.result = ExecutionResult.UNTESTED
+                break
 
 
 class Report:
@@ -951,12 +3365,33 @@ class Diff:
 
         return a_output, b_output, first_failure
 
+    # input and expected output to be shown, large cases show only the start of the input
+    # and the lines of the expected output around the first mismatch
+    @staticmethod
+    def unit_texts(unit: Unit) -> Tuple[str, str]:
+        if unit.preview is not None:
+            return unit.input_head(OutputMatcher.window), unit.preview
+        return unit.input, unit.output
+
+    # the lines may differ only in spaces or tolerated digits, so the comparators by token show the token
+    @staticmethod
+    def token_mismatch(unit: Unit) -> str:
+        if unit.mismatch is None or unit.compare is None or Comparator.get(unit.compare).name == "exact":
+            return ""
+        text = "First token mismatch (" + str(Comparator.get(unit.compare)) + "): " + str(unit.mismatch)
+        return Colored.paint(text, Color.BOLD) + "\n"
+
+    @staticmethod
+    def budget_exceeded(unit: Unit) -> str:
+        if unit.result != ExecutionResult.BUDGET_EXCEEDED:
+            return ""
+        return Colored.paint("Budget exceeded: " + Budget.exceeded(unit), Color.BOLD) + "\n"
+
     @staticmethod
     def mount_up_down_diff(unit: Unit) -> str:
         output = io.StringIO()
 
-        string_input = unit.input
-        string_expected = unit.output
+        string_input, string_expected = Diff.unit_texts(unit)
         string_received = unit.user
         expected_lines = []
         received_lines = []
@@ -974,6 +3409,8 @@ class Diff:
         output.write(Report.centralize(Colored.paint(" RECEIVED OUTPUT ", Color.RED), dotted) + "\n")
         output.write("\n".join(received_lines) + "\n")
         output.write(Diff.first_failure_diff(string_expected, string_received, first_failure))
+        output.write(Diff.token_mismatch(unit))
+        output.write(Diff.budget_exceeded(unit))
 
         return output.getvalue()
 
@@ -996,8 +3433,7 @@ class Diff:
 
         output = io.StringIO()
 
-        string_input = unit.input
-        string_expected = unit.output
+        string_input, string_expected = Diff.unit_texts(unit)
         string_received = unit.user
         expected_lines = []
         received_lines = []
@@ -1017,6 +3453,8 @@ class Diff:
         output.write(mount_side_by_side(expected_header, received_header , dotted, vertical_separator) + "\n")
         output.write(Diff.side_by_side(expected_lines, received_lines) + "\n")
         output.write(Diff.first_failure_diff(string_expected, string_received, first_failure))
+        output.write(Diff.token_mismatch(unit))
+        output.write(Diff.budget_exceeded(unit))
 
         return output.getvalue()
 
@@ -1094,10 +3532,11 @@ class Writer:
         text = "case=" + unit.case + "\n"
         text += "input=" + unit.input
         text += "output=\"" + unit.output + "\"\n"
+        if unit.grade is not None:
+            text += "grade reduction=" + str(unit.grade).zfill(3) + "%\n"
+        text += Budget.vpl_lines(unit)
         if unit.grade is None:
             text += "\n"
-        else:
-            text += "grade reduction=" + str(unit.grade).zfill(3) + "%\n"
         return text
 
     @staticmethod
@@ -1107,6 +3546,8 @@ class Writer:
             text += " " + unit.case
         elif unit.grade != 100:
             text += " " + str(unit.grade) + "%"
+        if Budget.header(unit) != "":
+            text += " " + Budget.header(unit)
         text += '\n' + unit.input
         text += "========\n"
         text += unit.output
@@ -1115,6 +3556,14 @@ class Writer:
         text += "<<<<<<<<\n"
         return text
 
+    # keep the comparator of the test file, if all units use the same
+    @staticmethod
+    def compare_header(unit_list: List[Unit]) -> str:
+        compare_set = set(unit.compare for unit in unit_list)
+        if len(compare_set) != 1 or None in compare_set:
+            return ""
+        return "#compare " + compare_set.pop() + "\n\n"
+
     @staticmethod
     def save_dir_files(folder: str, pattern_loader: PatternLoader, label: str, unit: Unit) -> None:
         file_source = pattern_loader.make_file_source(label)
@@ -1147,6 +3596,7 @@ class Writer:
                 _new = "\n".join([Writer.to_tio(unit) for unit in _unit_list])
             else:
                 _new = "\n".join([Writer.to_vpl(unit) for unit in _unit_list])
+            _new = Writer.compare_header(_unit_list) + _new
 
             file_exists = os.path.isfile(_target)
 
@@ -1222,9 +3672,9 @@ class Actions:
         pass
 
     @staticmethod
-    def exec(target_list: List[str]):
+    def exec(target_list: List[str], param: Param.Basic):
         try:
-            wdir = Wdir().set_target_list(target_list).build()
+            wdir = Wdir().set_profile(param.profile).set_target_list(target_list).build()
         except Runner.CompileError as e:
             print(e)
             return 0
@@ -1238,14 +3688,17 @@ class Actions:
 
     @staticmethod
     def list(target_list: List[str], param: Param.Basic):
-        wdir = Wdir().set_target_list(target_list).build().filter(param)
+        wdir = Wdir().set_profile(param.profile).set_target_list(target_list).build().filter(param)
         print(wdir.resume())
         print(wdir.unit_list_resume())
 
     @staticmethod
     def run(target_list: List[str], param: Param.Basic) -> int:
+        if param.pgo and not Profile.optimized(param.profile):
+            print("pgo: the " + param.profile + " profile does not optimize, using release")
+            param.set_profile("release")
         try:
-            wdir = Wdir().set_target_list(target_list).build().filter(param)
+            wdir = Wdir().set_profile(param.profile).set_compare(param.compare).set_target_list(target_list).build().filter(param)
         except Runner.CompileError as e:
             print(e)
             return 0
@@ -1256,24 +3709,223 @@ class Actions:
             print("\n" + Colored.paint("fail:", Color.RED) + " no solver found\n")
             return
         
-        print("[ ", end="")
-        for unit in wdir.unit_list:
-            unit.result = Execution.run_unit(wdir.solver, unit)
-            print(unit.result.value + " ", end="")
-        print("]\n")
+        if param.profile_solver is not None:
+            if not wdir.solver.executable.startswith("python "):
+                print("\n" + Colored.paint("fail:", Color.RED) + " --profile-solver is only available for python solvers\n")
+                return
+            param.set_zygote(False).set_cached(False)  # each unit must run under the profiler
+            param.profile_folder = tempfile.mkdtemp(dir=wdir.solver.temp_dir)
+        if param.zygote:
+            wdir.solver.start_zygote(min(param.jobs, max(1, len(wdir.unit_list))), param.limits)
+        param.limits.start()
+        if param.pgo:
+            try:
+                Actions.run_pgo(wdir, param)
+            except Runner.CompileError as e:
+                print("\n" + str(e))
+                return 0
+        elif param.batch:
+            Execution.run_batch(wdir.solver, wdir.unit_list, param.limits, param.batch_separator, param.fail_fast)
+            print("[ " + "".join(unit.result.value + " " for unit in wdir.unit_list) + "]\n")
+        else:
+            Actions.run_units(wdir, param)
+            if param.history:
+                History.save(wdir.unit_list)
+            if param.profile_folder is not None:
+                print(Profiler.report(param.profile_folder, wdir.unit_list, param.profile_solver))
+
+        if param.top is not None:
+            print(wdir.unit_list_resume(True))
+            print(wdir.top_resume(param.top) + "\n")
 
         if param.diff_mode != DiffMode.QUIET:        
-            results = [unit.result for unit in wdir.unit_list]
-            if (ExecutionResult.EXECUTION_ERROR in results) or (ExecutionResult.WRONG_OUTPUT in results):
-                print(wdir.unit_list_resume())
+            failures = [unit for unit in wdir.unit_list if unit.result not in [ExecutionResult.SUCCESS, ExecutionResult.UNTESTED]]
+            if len(failures) > 0:
+                if param.top is None:
+                    print(wdir.unit_list_resume())
 
-                wrong = [unit for unit in wdir.unit_list if unit.result != ExecutionResult.SUCCESS][0]
+                wrong = failures[0]
                 if param.is_up_down:
                     print(Diff.mount_up_down_diff(wrong))
                 else:
                     print(Diff.mount_side_by_side_diff(wrong))
         return wdir.calc_grade()
 
+    # run all units and print the results line
+    # with fail_fast, the first failure kills the executions in flight and the other units stay untested
+    @staticmethod
+    def run_units(wdir: Wdir, param: Param.Basic):
+        print("[ ", end="", flush=True)
+        stop = threading.Event()
+        lock = threading.Lock()
+        Runner.reset_cancel()
+
+        solver_key = ResultCache.solver_key(wdir.solver) if param.cached else ""
+        count = {"hits": 0, "misses": 0}
+
+        def run(unit: Unit) -> ExecutionResult:
+            if stop.is_set():
+                return ExecutionResult.UNTESTED
+            if param.profile_folder is not None:
+                # not compared while running, a wrong output killed early would lose its stats
+                solver = Profiler.solver(wdir.solver, param.profile_folder, unit)
+                if LargeCase.is_large(unit):
+                    info = Execution.execute(solver, unit, param.limits)
+                else:
+                    info = Execution.invoke(solver, unit.input, param.limits)
+                result = Execution.judge(unit, info, None, param.limits)
+            elif not param.cached or LargeCase.is_large(unit):
+                result = Execution.run_unit(wdir.solver, unit, param.limits)
+            else:
+                key = ResultCache.key(solver_key, unit, param.limits)
+                info = ResultCache.load(key, unit)
+                with lock:
+                    count["hits" if info is not None else "misses"] += 1
+                if info is None:
+                    cut = param.limits.cut()  # a unit cut by the global time, or never started, is not stored
+                    info = Execution.execute(wdir.solver, unit, param.limits)
+                    if not stop.is_set() and not (info.timeout and cut):
+                        ResultCache.store(key, unit, info)
+                result = Execution.judge(unit, info, None, param.limits)
+            with lock:
+                if stop.is_set():  # killed by the failure of other unit
+                    return ExecutionResult.UNTESTED
+                if param.fail_fast and result != ExecutionResult.SUCCESS:
+                    stop.set()
+            if stop.is_set():
+                Runner.cancel_all()
+            return result
+
+        # os processos rodam em paralelo, mas os resultados sao mostrados na ordem dos testes
+        order = History.schedule(wdir.unit_list) if param.history else wdir.unit_list
+        with concurrent.futures.ThreadPoolExecutor(max_workers=param.jobs) as pool:
+            futures = {id(unit): pool.submit(run, unit) for unit in order}
+            for unit in wdir.unit_list:
+                unit.result = futures[id(unit)].result()
+                print(unit.result.value + " ", end="", flush=True)
+        if not param.cached:
+            print("]\n")
+            return
+        print("]")
+        print("cache: " + str(count["hits"]) + " hits, " + str(count["misses"]) + " misses\n")
+        ResultCache.evict()
+
+    # run the suite with the usual build, train the instrumented build with the suite
+    # and run it again with the optimized build, showing the speedup of each case
+    @staticmethod
+    def run_pgo(wdir: Wdir, param: Param.Basic):
+        solver = wdir.solver
+        if solver.build_args is None:
+            raise ValueError("\nfail: pgo is only available for c/c++ solvers")
+        print("")
+        print("pgo:baseline ", end="")
+        Actions.run_units(wdir, param)
+        before = [unit.wall_time for unit in wdir.unit_list]
+
+        solver.prepare_pgo("generate")
+        print("pgo:training ", end="")
+        Actions.run_units(wdir, param)
+
+        solver.prepare_pgo("use")
+        print("pgo:optimized ", end="")
+        Actions.run_units(wdir, param)
+        after = [unit.wall_time for unit in wdir.unit_list]
+
+        ms = Unit.ms
+
+        def speedup(a: Optional[float], b: Optional[float]) -> str:
+            if a is None or b is None or b == 0:
+                return "-"
+            return "{:.2f}x".format(a / b)
+
+        lines = []
+        for unit, a, b in zip(wdir.unit_list, before, after):
+            index = str(unit.index).zfill(2)
+            lines.append(Symbol.tab + "[%s] %s before:%s after:%s speedup:%s" % (index, unit.case.ljust(unit.case_pad), ms(a).rjust(9), ms(b).rjust(9), speedup(a, b).rjust(7)))
+        total_a = sum(a for a in before if a is not None)
+        total_b = sum(b for b in after if b is not None)
+        print(Colored.paint("pgo speedup:", Color.GREEN) + " total before:" + ms(total_a) + " after:" + ms(total_b) + " speedup:" + speedup(total_a, total_b))
+        print("\n".join(lines) + "\n")
+
+    @staticmethod
+    def bench(target_list: List[str], param: Param.Basic) -> bool:
+        target_list = [t for t in target_list if t != ""]
+        paths = [t for t in target_list if Identifier.get_type(t) == IdentifierType.SOLVER]
+        sources = [t for t in target_list if Identifier.get_type(t) != IdentifierType.SOLVER]
+        if len(paths) == 0:
+            print("\n" + Colored.paint("fail:", Color.RED) + " no solver found\n")
+            return False
+        try:
+            wdir = Wdir().set_profile(param.profile).set_compare(param.compare).set_sources(sources).build().filter(param)
+            solvers = [Solver([path], param.profile) for path in paths]
+        except Runner.CompileError as e:
+            print(e)
+            return False
+        return Bench.run(solvers, wdir, param.limits)
+
+    # the units sorted by input size, or the inputs created by the generator
+    @staticmethod
+    def complexity(target_list: List[str], param: Param.Basic, generator: Optional[str], sizes: List[int],
+                   expected: Optional[str]) -> bool:
+        target_list = [t for t in target_list if t != ""]
+        paths = [t for t in target_list if Identifier.get_type(t) == IdentifierType.SOLVER]
+        sources = [t for t in target_list if Identifier.get_type(t) != IdentifierType.SOLVER]
+        if len(paths) == 0:
+            print("\n" + Colored.paint("fail:", Color.RED) + " no solver found\n")
+            return False
+        try:
+            solver = Solver(paths, param.profile)
+        except Runner.CompileError as e:
+            print(e)
+            return False
+        if generator is not None:
+            units = Complexity.generate(generator, sizes)
+        else:
+            wdir = Wdir().set_sources(sources).build()
+            wdir.manipulate(Param.Manip().set_to_sort(True))
+            units = wdir.unit_list
+            sizes = [unit.input_size() for unit in units]
+        return Complexity.run(solver, units, sizes, param.limits, expected)
+
+    # keep a subset of the cases with the same coverage of the reference solver and the same verdicts
+    # the outputs are compared after the run, a killed reference would not write the coverage
+    @staticmethod
+    def minimize(target_out: str, target_list: List[str], limits: Limits, profile: str, to_force: bool) -> bool:
+        paths = [t for t in target_list if Identifier.get_type(t) == IdentifierType.SOLVER]
+        sources = [t for t in target_list if Identifier.get_type(t) != IdentifierType.SOLVER]
+        if len(paths) == 0:
+            print("\n" + Colored.paint("fail:", Color.RED) + " no reference solver found\n")
+            return False
+        try:
+            wdir = Wdir().set_profile(profile).set_target_list(paths).set_sources(sources).build()
+            folder = wdir.solver.prepare_coverage()
+        except Runner.CompileError as e:
+            print(e)
+            return False
+        wdir.manipulate(Param.Manip())  # the duplicated cases add nothing
+        print(wdir.resume())
+        print("[ ", end="", flush=True)
+        coverage: List[set] = []
+        for unit in wdir.unit_list:
+            Coverage.reset(folder)
+            if LargeCase.is_large(unit):
+                info = Execution.execute(wdir.solver, unit, limits)
+            else:
+                info = Execution.invoke(wdir.solver, unit.input, limits)
+            unit.result = Execution.judge(unit, info, None, limits)
+            print(unit.result.value + " ", end="", flush=True)
+            coverage.append(Coverage.collect(wdir.solver, folder) | {("verdict", unit.result.name, 0, 0)})
+        print("]\n")
+
+        chosen = Coverage.minimize(coverage, [unit.input_size() for unit in wdir.unit_list])
+        covered = set().union(*coverage) if len(coverage) > 0 else set()
+        text = " cases:" + str(len(wdir.unit_list)) + " kept:" + str(len(chosen))
+        for kind, label in [("line", "lines"), ("branch", "branches"), ("verdict", "verdicts")]:
+            text += " " + label + ":" + str(Coverage.count(covered, kind))
+        print(Colored.paint("minimize:", Color.GREEN) + text)
+        Writer.save_target(target_out, [wdir.unit_list[i] for i in chosen], to_force)
+        return True
+
     @staticmethod
     def build(target_out: str, source_list: List[str], param: Param.Manip, to_force: bool) -> bool:
         try:
@@ -1286,6 +3938,317 @@ class Actions:
         return True
 
 
+class Bench:
+    repeat: int = 5  # measured executions of each unit by each solver
+    warmup: int = 1  # executions discarded before measuring
+
+    def __init__(self):
+        pass
+
+    # the cores isolated from the scheduler by the kernel, or the last one available to tk
+    # None where the affinity can not be set, like macos, the solver then runs on any core
+    @staticmethod
+    def cores() -> Optional[List[int]]:
+        if not hasattr(os, "sched_getaffinity"):
+            return None
+        available = sorted(os.sched_getaffinity(0))
+        try:
+            with open("/sys/devices/system/cpu/isolated") as f:
+                text = f.read().strip()
+        except OSError:
+            text = ""
+        isolated: List[int] = []
+        for part in [p for p in text.split(",") if p != ""]:
+            first, _, last = part.partition("-")
+            isolated += list(range(int(first), int(last if last != "" else first) + 1))
+        return isolated if len(isolated) > 0 else available[-1:]
+
+    # median wall time of a process that does nothing, started the same way as the solvers
+    @staticmethod
+    def overhead(limits: Limits) -> float:
+        empty = shutil.which("true")
+        if empty is None:
+            return 0.0
+        times = [Runner.limited_run([empty], "", limits).wall_time for _ in range(Bench.warmup + Bench.repeat * 4)]
+        return statistics.median(times[Bench.warmup:])
+
+    # median and the median absolute deviation of the samples
+    @staticmethod
+    def spread(samples: List[float]) -> Tuple[float, float]:
+        median = statistics.median(samples)
+        return median, statistics.median([abs(x - median) for x in samples])
+
+    @staticmethod
+    def ratio(base: float, value: float) -> str:
+        return "-" if value <= 0 else "{:.2f}x".format(base / value)
+
+    # the solvers are interleaved in each round, so a change in the machine load affects all of them
+    @staticmethod
+    def measure(solvers: List[Solver], unit: Unit, limits: Limits) -> Tuple[List[List[float]], List[ExecutionResult]]:
+        samples: List[List[float]] = [[] for _ in solvers]
+        results = [ExecutionResult.SUCCESS for _ in solvers]
+        for i in range(Bench.warmup + Bench.repeat):
+            for s, solver in enumerate(solvers):
+                info = Execution.execute(solver, unit, limits)
+                result = Execution.judge(unit, info, None, limits)
+                if result != ExecutionResult.SUCCESS:
+                    results[s] = result
+                if i >= Bench.warmup:
+                    samples[s].append(info.wall_time)
+        return samples, results
+
+    @staticmethod
+    def run(solvers: List[Solver], wdir: Wdir, limits: Limits) -> bool:
+        limits.set_cpus(Bench.cores())
+        overhead = Bench.overhead(limits)
+        names = [os.path.basename(solver.path_list[0]) for solver in solvers]
+        print(Colored.paint("bench:", Color.GREEN) + " tests:" + str(len(wdir.unit_list)).zfill(2) +
+              " cores:" + ("any" if limits.cpus is None else ",".join(str(c) for c in limits.cpus)) + " repeat:" + str(Bench.repeat) +
+              " warmup:" + str(Bench.warmup) + " overhead:" + Unit.ms(overhead))
+        print(Symbol.tab + "solvers: " + "  ".join(names))
+        medians: List[List[float]] = [[] for _ in solvers]
+        verdicts: List[List[ExecutionResult]] = [[] for _ in solvers]
+        for unit in wdir.unit_list:
+            samples, results = Bench.measure(solvers, unit, limits)
+            columns = []
+            for s in range(len(solvers)):
+                median, mad = Bench.spread([max(0.0, x - overhead) for x in samples[s]])
+                medians[s].append(median)
+                verdicts[s].append(results[s])
+                column = "%s %s ±%s" % (results[s], Unit.ms(median).rjust(9), Unit.ms(mad).rjust(8))
+                if s > 0:
+                    column += " " + Bench.ratio(medians[0][-1], median).rjust(7)
+                columns.append(column)
+            print(Symbol.tab + "[%s] %s %s" % (str(unit.index).zfill(2), unit.case.ljust(unit.case_pad), "  ".join(columns)))
+
+        # the overall speedup is the geometric mean of the ratios of each case
+        agree = True
+        for s in range(len(solvers)):
+            failures = len([v for v in verdicts[s] if v != ExecutionResult.SUCCESS])
+            agree = agree and failures == 0
+            text = names[s] + " total:" + Unit.ms(sum(medians[s])) + " failures:" + str(failures)
+            ratios = [a / b for a, b in zip(medians[0], medians[s]) if a > 0 and b > 0]
+            if s > 0 and len(ratios) > 0:
+                text += " speedup:" + "{:.2f}x".format(math.exp(sum(math.log(r) for r in ratios) / len(ratios)))
+            print(Colored.paint("bench:", Color.GREEN) + " " + text)
+        if not agree:
+            print(Colored.paint("fail:", Color.RED) + " some solvers do not agree with the expected output")
+        print("")
+        return agree
+
+
+class Complexity:
+    sizes: List[int] = [1000, 2000, 4000, 8000, 16000, 32000, 64000]  # default sizes for the generator
+    exponential_max: int = 60  # 2^n is only fitted when the sizes are small enough to make sense
+    alpha: float = 0.05  # significance needed to take a faster growth than the one already chosen
+
+    # growth classes in increasing order, the name is shown as O(name)
+    models = [
+        ("1", lambda n: 1.0),
+        ("log n", lambda n: math.log2(max(n, 2))),
+        ("n", lambda n: float(n)),
+        ("n log n", lambda n: n * math.log2(max(n, 2))),
+        ("n^2", lambda n: float(n) ** 2),
+        ("n^3", lambda n: float(n) ** 3),
+        ("2^n", lambda n: 2.0 ** n),
+    ]
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def names() -> List[str]:
+        return [name for name, _ in Complexity.models]
+
+    # least squares of t = a + c * f(n) with c >= 0, returns the residual sum of squares
+    @staticmethod
+    def fit(xs: List[float], ts: List[float]) -> float:
+        mean_x = sum(xs) / len(xs)
+        mean_t = sum(ts) / len(ts)
+        var = sum((x - mean_x) ** 2 for x in xs)
+        c = 0.0 if var == 0 else max(0.0, sum((x - mean_x) * (t - mean_t) for x, t in zip(xs, ts)) / var)
+        a = mean_t - c * mean_x
+        return sum((t - a - c * x) ** 2 for x, t in zip(xs, ts))
+
+    # regularized incomplete beta function, continued fraction of numerical recipes
+    @staticmethod
+    def beta_inc(a: float, b: float, x: float) -> float:
+        if x <= 0 or x >= 1:
+            return max(0.0, min(1.0, x))
+        if x > (a + 1) / (a + b + 2):  # the fraction converges fast only on this side
+            return 1 - Complexity.beta_inc(b, a, 1 - x)
+        front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x)) / a
+        tiny = 1e-300
+        c, d = 1.0, 1 - (a + b) * x / (a + 1)
+        d = 1 / (d if abs(d) > tiny else tiny)
+        result = d
+        for m in range(1, 200):
+            for num in [m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                        -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))]:
+                d = 1 + num * d
+                d = 1 / (d if abs(d) > tiny else tiny)
+                c = 1 + num / c
+                c = c if abs(c) > tiny else tiny
+                result *= c * d
+            if abs(c * d - 1) < 1e-12:
+                break
+        return front * result
+
+    # p-value of the F test of a fit with one more parameter, F(1, df)
+    @staticmethod
+    def p_value(rss_before: float, rss_after: float, df: int) -> float:
+        if rss_after >= rss_before:
+            return 1.0
+        if rss_after <= 0:
+            return 0.0
+        f = (rss_before - rss_after) / (rss_after / df)
+        return Complexity.beta_inc(df / 2, 0.5, df / (df + f))
+
+    # the growth chosen, all the classes ordered by the fit with their r2, and the confidence from 0 to 1
+    # starting from O(1), a faster growth is only taken when its F test against the growth chosen so far
+    # is significant, so the noise of a flat solver does not make it look slower
+    # the confidence is 1 - p of the test that took the growth, for O(1) the p of the strongest growth refused
+    @staticmethod
+    def classify(sizes: List[int], times: List[float]) -> Tuple[str, List[Tuple[str, float]], float]:
+        if len(set(sizes)) < 3:
+            raise ValueError("fail: at least 3 different input sizes are needed to estimate the complexity")
+        mean_t = sum(times) / len(times)
+        total = sum((t - mean_t) ** 2 for t in times)
+        df = len(times) - 2
+        fits = []
+        chosen, chosen_rss, confidence = "1", total, 1.0
+        for name, f in Complexity.models[1:]:
+            if name == "2^n" and max(sizes) > Complexity.exponential_max:
+                continue
+            rss = Complexity.fit([f(n) for n in sizes], times)
+            fits.append((name, rss, 1.0 if total == 0 else 1 - rss / total))
+            p = Complexity.p_value(chosen_rss, rss, df)
+            if p < Complexity.alpha:
+                chosen, chosen_rss, confidence = name, rss, 1 - p
+            elif chosen == "1":
+                confidence = min(confidence, p)
+        fits.append(("1", total, 0.0))
+        fits.sort(key=lambda x: x[1])
+        return chosen, [(name, r2) for name, _rss, r2 in fits], confidence
+
+    # slope of log t by log n, 1 for linear, 2 for quadratic
+    @staticmethod
+    def slope(sizes: List[int], times: List[float]) -> Optional[float]:
+        points = [(math.log(n), math.log(t)) for n, t in zip(sizes, times) if n > 0 and t > 0]
+        if len(points) < 2:
+            return None
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        var = sum((x - mean_x) ** 2 for x, _ in points)
+        return None if var == 0 else sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+    # inputs created by a shell command, {} is replaced by the size
+    @staticmethod
+    def generate(command: str, sizes: List[int]) -> List[Unit]:
+        units = []
+        for i, n in enumerate(sizes):
+            code, out, err = Runner.subprocess_run(["sh", "-c", command.replace("{}", str(n))])
+            if code != 0:
+                raise ValueError("fail: generator failed for size " + str(n) + "\n" + err)
+            unit = Unit("n=" + str(n), out, "")
+            unit.index = i
+            units.append(unit)
+        return units
+
+    # the output is not compared, a wrong solver is measured until the end as a correct one
+    @staticmethod
+    def measure(solver: Solver, unit: Unit, limits: Limits) -> Tuple[float, bool]:
+        samples = []
+        timeout = False
+        for i in range(Bench.warmup + Bench.repeat):
+            if LargeCase.is_large(unit):
+                info = LargeCase.run(solver, unit, limits)
+            else:
+                info = Execution.invoke(solver, unit.input, limits)
+            timeout = timeout or info.timeout
+            if i >= Bench.warmup:
+                samples.append(info.wall_time)
+        return statistics.median(samples), timeout
+
+    @staticmethod
+    def run(solver: Solver, units: List[Unit], sizes: List[int], limits: Limits, expected: Optional[str]) -> bool:
+        limits.set_cpus(Bench.cores())
+        overhead = Bench.overhead(limits)
+        print(Colored.paint("complexity:", Color.GREEN) + " solver:" + os.path.basename(solver.path_list[0]) +
+              " points:" + str(len(units)).zfill(2) + " repeat:" + str(Bench.repeat) + " overhead:" + Unit.ms(overhead))
+        times = []
+        for unit, n in zip(units, sizes):
+            median, timeout = Complexity.measure(solver, unit, limits)
+            times.append(max(0.0, median - overhead))
+            mark = " " + Symbol.timeout if timeout else ""
+            print(Symbol.tab + "[%s] n:%s %s%s" % (str(unit.index).zfill(2), str(n).rjust(10), Unit.ms(times[-1]).rjust(10), mark))
+        best, fits, confidence = Complexity.classify(sizes, times)
+        slope = Complexity.slope(sizes, times)
+        print(Symbol.tab + "fits: " + "  ".join("O(%s) r2:%.3f" % (name, r2) for name, r2 in fits))
+        text = " O(" + best + ") r2:%.3f confidence:%.2f" % (dict(fits)[best], confidence)
+        if slope is not None:
+            text += " slope:%.2f" % slope
+        print(Colored.paint("complexity:", Color.GREEN) + text)
+        names = Complexity.names()
+        if expected is not None and names.index(best) > names.index(expected):
+            print(Colored.paint("fail:", Color.RED) + " expected at most O(" + expected + ")\n")
+            return False
+        print("")
+        return True
+
+
+class Coverage:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def reset(folder: str):
+        for entry in os.listdir(folder):
+            if entry.endswith(".gcda"):
+                os.remove(os.path.join(folder, entry))
+
+    # lines executed and branches taken in the sources of the solver, read from gcov json
+    @staticmethod
+    def collect(solver: Solver, folder: str) -> set:
+        gcda = [os.path.join(folder, e) for e in os.listdir(folder) if e.endswith(".gcda")]
+        if len(gcda) == 0:  # killed before the exit, nothing was written
+            return set()
+        code, out, err = Runner.subprocess_run(["gcov", "-b", "-j", "-t", "-o", folder] + gcda)
+        if code != 0:
+            raise ValueError("fail: gcov failed\n" + err)
+        sources = set(os.path.realpath(path) for path in solver.path_list)
+        items = set()
+        for line in out.splitlines():
+            if line.strip() == "":
+                continue
+            for entry in json.loads(line)["files"]:
+                if os.path.realpath(entry["file"]) not in sources:  # system headers
+                    continue
+                name = os.path.basename(entry["file"])
+                for cover in entry["lines"]:
+                    if cover["count"] > 0:
+                        items.add(("line", name, cover["line_number"], 0))
+                    for i, branch in enumerate(cover["branches"]):
+                        if branch["count"] > 0:
+                            items.add(("branch", name, cover["line_number"], i))
+        return items
+
+    # greedy set cover, the unit covering more new items goes first, the smaller input on ties
+    @staticmethod
+    def minimize(coverage: List[set], sizes: List[int]) -> List[int]:
+        missing = set().union(*coverage) if len(coverage) > 0 else set()
+        chosen: List[int] = []
+        while len(missing) > 0:
+            best = max(range(len(coverage)), key=lambda i: (len(coverage[i] & missing), -sizes[i]))
+            chosen.append(best)
+            missing -= coverage[best]
+        return sorted(chosen)
+
+    @staticmethod
+    def count(items: set, kind: str) -> int:
+        return len([item for item in items if item[0] == kind])
+
+
 class Down:
 
     @staticmethod
@@ -1481,6 +4444,7 @@ class Config:
         
     def __init__(self):
         self.view: str = ""          # updown or sidebyside diff
+        self.profile: str = ""       # build profile for c/c++ solvers
         self.base: str = ""          # which base to use
         self.case: int = -1          # run all or a specific index case
         self.folder: str = ""        # which folder to use
@@ -1495,6 +4459,7 @@ class Config:
         config["DEFAULT"] = {
             "base": Choose.base[0],
             "view": Choose.view[0],
+            "profile": Profile.default,
             "case": "-1",
             "folder": "/",
             "tests": "",
@@ -1533,6 +4498,7 @@ class Config:
         config["DEFAULT"] = {
             "base": self.base,
             "view": self.view,
+            "profile": self.profile,
             "case": str(self.case),
             "folder": self.folder,
             "tests": ",".join(self.tests),
@@ -1565,6 +4531,9 @@ class Config:
 
         self.base = parser["DEFAULT"]["base"]
         self.view = parser["DEFAULT"]["view"]
+        self.profile = parser["DEFAULT"].get("profile", Profile.default)  # optional for old config files
+        if self.profile not in Profile.names():
+            self.profile = Profile.default
         self.case = int(parser["DEFAULT"]["case"])
         self.folder = parser["DEFAULT"]["folder"]
         tests = parser["DEFAULT"]["tests"].split(",")
@@ -1589,6 +4558,7 @@ class Config:
     def __str__(self):
         return  "b.ase: " + self.base + "\n" + \
                 "v.iew: " + self.view + "\n" + \
+                "p.rofile: " + self.profile + "\n" + \
                 "i.ndex: " + str(self.case) + "\n" + \
                 "f.older: " + self.folder + "\n" + \
                 "t.ests: " + str(self.tests) + "\n" + \
@@ -1604,6 +4574,7 @@ class GuiActions:
         print("b ou base: define a base de dados entre as disciplinas fup, ed e poo.")
         print("v ou view: alterna entre mostrar a visualização de erros up_down ou side_by_site.")
         print("c ou case: define o index do caso de teste a ser executado ou -1 para todos.")
+        print("p ou profile: define o perfil de compilação de c/c++ entre " + ", ".join(Profile.names()) + ".")
         print("")
         print("d ou down: faz o download do problema utilizando o label e a extensão.")
         print("e ou exec: roda o problema esperando a entrada do usuário.")
@@ -1651,6 +4622,8 @@ class GuiActions:
             cmd += ["-i", str(config.case)]
         if config.view == "down":
             cmd += ["-v"]
+        if config.profile != Profile.default:
+            cmd += ["--profile", config.profile]
         print(Colored.green("$ " + " ".join(cmd)))
         os.chdir(config.folder)
         subprocess.run(cmd)
@@ -1663,6 +4636,8 @@ class GuiActions:
             return
         cmd = ["tk", "exec"]
         cmd += config.solvers
+        if config.profile != Profile.default:
+            cmd += ["--profile", config.profile]
         print(Colored.green("$ " + " ".join(cmd)))
         # imprime _ até o final da linha
         
@@ -1852,6 +4827,8 @@ def gui_main(_args):
             config.view = Choose.validate_or_choose_one(config.view, ui_list, Choose.view)
         elif cmd == "c" or cmd == "case":
             config.case = Choose.choose_index(ui_list)
+        elif cmd == "p" or cmd == "profile":
+            config.profile = Choose.validate_or_choose_one(config.profile, ui_list, Profile.names())
         elif cmd == "d" or cmd == "down":
             GuiActions.down(ui_list, config)
         elif cmd == "e" or cmd == "exec":
@@ -1878,14 +4855,30 @@ def gui_main(_args):
 class Main:
     @staticmethod
     def execute(args):
-        Actions.exec(args.target_list)
+        BuildCache.enabled = not args.no_cache
+        param = Param.Basic().set_profile(args.profile)
+        Actions.exec(args.target_list, param)
 
     @staticmethod
     def run(args):
         if args.width is not None:
             Report.set_terminal_size(args.width)
         PatternLoader.pattern = args.pattern
-        param = Param.Basic().set_index(args.index)
+        BuildCache.enabled = not args.no_cache
+        Solver.java_cds = args.java_cds
+        Solver.java_host = args.java_host
+        limits = Limits().set_wall_time(args.timeout).set_cpu_time(args.cpu_limit).set_global_time(args.global_timeout)
+        limits.set_memory(args.memory_limit).set_stack(args.stack_limit).set_file_size(args.fsize_limit).set_processes(args.nproc_limit)
+        limits.set_output(args.output_limit)
+        param = Param.Basic().set_index(args.index).set_jobs(args.jobs).set_limits(limits).set_profile(args.profile)
+        param.set_pgo(args.pgo).set_zygote(args.zygote).set_batch(args.batch, args.batch_separator)
+        param.set_fail_fast(args.fail_fast).set_cached(args.cached).set_history(not args.no_history)
+        param.set_top(args.top).set_profile_solver(args.profile_solver)
+        try:
+            param.set_compare(None if args.compare is None else str(Comparator.get(args.compare)))
+        except ValueError as e:
+            print(e)
+            return 1
         if args.quiet:
             param.set_diff_mode(DiffMode.QUIET)
         if args.vertical:
@@ -1895,12 +4888,53 @@ class Main:
         return 1
 
 
+    @staticmethod
+    def bench(args):
+        if args.width is not None:
+            Report.set_terminal_size(args.width)
+        PatternLoader.pattern = args.pattern
+        BuildCache.enabled = not args.no_cache
+        Bench.repeat = max(1, args.repeat)
+        Bench.warmup = max(0, args.warmup)
+        limits = Limits().set_wall_time(args.timeout)
+        param = Param.Basic().set_index(args.index).set_limits(limits).set_profile(args.profile)
+        try:
+            param.set_compare(None if args.compare is None else str(Comparator.get(args.compare)))
+        except ValueError as e:
+            print(e)
+            return 1
+        if Actions.bench(args.target_list, param):
+            return 0
+        return 1
+
+    @staticmethod
+    def complexity(args):
+        if args.width is not None:
+            Report.set_terminal_size(args.width)
+        PatternLoader.pattern = args.pattern
+        BuildCache.enabled = not args.no_cache
+        Bench.repeat = max(1, args.repeat)
+        Bench.warmup = max(0, args.warmup)
+        sizes = Complexity.sizes
+        if args.sizes is not None:
+            try:
+                sizes = [int(x) for x in args.sizes.split(",")]
+            except ValueError:
+                print("fail: sizes must be integers separated by commas")
+                return 1
+        limits = Limits().set_wall_time(args.timeout)
+        param = Param.Basic().set_limits(limits).set_profile(args.profile)
+        if Actions.complexity(args.target_list, param, args.generator, sizes, args.expect):
+            return 0
+        return 1
+
     @staticmethod
     def list(args):
         if args.width is not None:
             Report.set_terminal_size(args.width)
         PatternLoader.pattern = args.pattern
-        param = Param.Basic().set_index(args.index)
+        BuildCache.enabled = not args.no_cache
+        param = Param.Basic().set_index(args.index).set_profile(args.profile)
         Actions.list(args.target_list, param)
         return 0
 
@@ -1913,6 +4947,16 @@ class Main:
         Actions.build(args.target, args.target_list, manip, args.force)
         return 0
 
+    @staticmethod
+    def minimize(args):
+        if args.width is not None:
+            Report.set_terminal_size(args.width)
+        PatternLoader.pattern = args.pattern
+        BuildCache.enabled = not args.no_cache
+        limits = Limits().set_wall_time(args.timeout)
+        Actions.minimize(args.target, args.target_list, limits, args.profile or Profile.default, args.force)
+        return 0
+
     @staticmethod
     def update(args):
         if args.width is not None:
@@ -1946,6 +4990,9 @@ class Main:
         parent_basic.add_argument('--index', '-i', metavar="I", type=int, help='run a specific index.')
         parent_basic.add_argument('--pattern', '-p', metavar="P", type=str, default='@.in @.sol',
                                   help='pattern load/save a folder, default: "@.in @.sol"')
+        parent_basic.add_argument('--no-cache', action='store_true', help='always compile the solver, ignoring the build cache.')
+        parent_basic.add_argument('--profile', metavar="NAME", type=str, choices=Profile.names(),
+                                  help='c/c++ build profile: ' + ", ".join(Profile.names()) + ', default: ' + Profile.default)
 
         parent_manip = argparse.ArgumentParser(add_help=False)
         parent_manip.add_argument('--width', '-w', type=int, help="term width.")
@@ -1958,6 +5005,34 @@ class Main:
         parser = argparse.ArgumentParser(prog='tk')
         subparsers = parser.add_subparsers(title='subcommands', help='help for subcommand.')
 
+        # bench
+        parser_bn = subparsers.add_parser('bench', parents=[parent_basic], help='compare the time of several solvers.')
+        parser_bn.add_argument('target_list', metavar='T', type=str, nargs='*', help='solvers and test targets.')
+        parser_bn.add_argument('--repeat', '-r', type=int, default=Bench.repeat, help='measured runs of each case, default ' + str(Bench.repeat) + '.')
+        parser_bn.add_argument('--warmup', type=int, default=Bench.warmup, help='discarded runs before measuring, default ' + str(Bench.warmup) + '.')
+        parser_bn.add_argument('--timeout', '-t', type=float, help='wall time limit in seconds for each execution.')
+        parser_bn.add_argument('--compare', '-c', type=str, metavar='SPEC', help='comparator: ' + ", ".join(Comparator.names) + '.')
+        parser_bn.set_defaults(func=Main.bench)
+
+        # complexity
+        parser_cx = subparsers.add_parser('complexity', parents=[parent_basic], help='estimate the complexity of a solver.')
+        parser_cx.add_argument('target_list', metavar='T', type=str, nargs='*', help='solver and test targets.')
+        parser_cx.add_argument('--generator', '-g', type=str, metavar='CMD', help='shell command printing an input of size {}, instead of the test cases.')
+        parser_cx.add_argument('--sizes', type=str, metavar='N,N,...', help='sizes given to the generator, default: ' + ",".join(str(n) for n in Complexity.sizes) + '.')
+        parser_cx.add_argument('--expect', '-e', type=str, choices=Complexity.names(), help='fail if the solver grows faster than this class.')
+        parser_cx.add_argument('--repeat', '-r', type=int, default=3, help='measured runs of each input, default 3.')
+        parser_cx.add_argument('--warmup', type=int, default=Bench.warmup, help='discarded runs before measuring, default ' + str(Bench.warmup) + '.')
+        parser_cx.add_argument('--timeout', '-t', type=float, help='wall time limit in seconds for each execution.')
+        parser_cx.set_defaults(func=Main.complexity)
+
+        # minimize
+        parser_mn = subparsers.add_parser('minimize', parents=[parent_basic], help='keep the cases that cover the reference solver.')
+        parser_mn.add_argument('target_list', metavar='T', type=str, nargs='+', help='c/c++ reference solver and test targets.')
+        parser_mn.add_argument('target', metavar='T_OUT', type=str, help='target to be build.')
+        parser_mn.add_argument('--timeout', '-t', type=float, help='wall time limit in seconds for each execution.')
+        parser_mn.add_argument('--force', '-f', action='store_true', help='enable overwrite.')
+        parser_mn.set_defaults(func=Main.minimize)
+
         # list
         parser_l = subparsers.add_parser('list', parents=[parent_basic], help='show case packs or folders.')
         parser_l.add_argument('target_list', metavar='T', type=str, nargs='*', help='targets.')
@@ -1973,6 +5048,29 @@ class Main:
         parser_r.add_argument('target_list', metavar='T', type=str, nargs='*', help='solvers, test cases or folders.')
         parser_r.add_argument('--vertical', '-v', action='store_true', help="use vertical mode.")
         parser_r.add_argument('--quiet', '-q', action='store_true', help='quiet mode, dont show diffs')
+        parser_r.add_argument('--jobs', '-j', metavar="N", type=int, help='number of parallel executions, default: cpu count.')
+        parser_r.add_argument('--pgo', action='store_true', help='c/c++ only, train a profile guided build with the tests and show the speedup.')
+        parser_r.add_argument('--zygote', '-z', action='store_true', help='python, js and ts only, run each execution from a warm interpreter.')
+        parser_r.add_argument('--batch', '-b', action='store_true', help='run all cases in a single execution, the input starts with the number of cases.')
+        parser_r.add_argument('--batch-separator', metavar="LINE", type=str, help='batch mode using LINE after each input and each answer instead of the count.')
+        parser_r.add_argument('--fail-fast', '-x', action='store_true', help='stop at the first failure, the other cases stay untested.')
+        parser_r.add_argument('--cached', action='store_true', help='reuse the results of the cases with the same solver and input.')
+        parser_r.add_argument('--top', type=int, nargs='?', const=5, metavar='N', help='show wall, user, sys time and peak rss of each case and the N slowest and most memory hungry, default 5.')
+        parser_r.add_argument('--profile-solver', type=str, nargs='?', const="", metavar='FILE', help='run a python solver under cProfile, show the hottest functions and save the merged stats in FILE.')
+        parser_r.add_argument('--java-host', action='store_true', help='experimental, with --zygote run java solvers in a persistent jvm.')
+        parser_r.add_argument('--java-cds', action='store_true', help='record a class data archive of the java solver in the first case and start the jvm with it in the next runs.')
+        parser_r.add_argument('--no-history', action='store_true', help='run in file order and do not store ' + History.filename + '.')
+        parser_r.add_argument('--compare', '-c', metavar="NAME", type=str,
+                              help='comparator: exact, token, ws (ignore spaces and empty lines) or float[:tolerance], default: '
+                                   'the one in the test file or exact.')
+        parser_r.add_argument('--timeout', '-t', metavar="S", type=float, help='wall time limit in seconds for each execution.')
+        parser_r.add_argument('--cpu-limit', metavar="S", type=int, help='cpu time limit in seconds for each execution.')
+        parser_r.add_argument('--global-timeout', metavar="S", type=float, help='wall time limit in seconds for the whole run.')
+        parser_r.add_argument('--memory-limit', '-m', metavar="MB", type=int, help='address space limit in MB for each execution.')
+        parser_r.add_argument('--output-limit', metavar="MB", type=int, help='kill the solver if it writes more than MB in stdout or stderr.')
+        parser_r.add_argument('--stack-limit', metavar="MB", type=int, help='stack limit in MB for each execution.')
+        parser_r.add_argument('--fsize-limit', metavar="MB", type=int, help='limit in MB for each file created by the solver.')
+        parser_r.add_argument('--nproc-limit', metavar="N", type=int, help='limit of processes for the user running the solver.')
         parser_r.set_defaults(func=Main.run)
 
         # build